@@ -0,0 +1,52 @@
+"""graph checkpoints
+
+Revision ID: 3f1c9a7d2e64
+Revises: b9551e27e908
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7d2e64'
+down_revision: Union[str, Sequence[str], None] = 'b9551e27e908'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('graph_checkpoints',
+    sa.Column('thread_id', sa.String(), nullable=False),
+    sa.Column('checkpoint_ns', sa.String(), nullable=False),
+    sa.Column('checkpoint_id', sa.String(), nullable=False),
+    sa.Column('parent_checkpoint_id', sa.String(), nullable=True),
+    sa.Column('checkpoint_type', sa.String(), nullable=False),
+    sa.Column('checkpoint', sa.LargeBinary(), nullable=False),
+    sa.Column('metadata_type', sa.String(), nullable=False),
+    sa.Column('checkpoint_metadata', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('thread_id', 'checkpoint_ns', 'checkpoint_id', name=op.f('pk_graph_checkpoints'))
+    )
+    op.create_table('graph_checkpoint_writes',
+    sa.Column('thread_id', sa.String(), nullable=False),
+    sa.Column('checkpoint_ns', sa.String(), nullable=False),
+    sa.Column('checkpoint_id', sa.String(), nullable=False),
+    sa.Column('task_id', sa.String(), nullable=False),
+    sa.Column('idx', sa.Integer(), nullable=False),
+    sa.Column('channel', sa.String(), nullable=False),
+    sa.Column('value_type', sa.String(), nullable=False),
+    sa.Column('value', sa.LargeBinary(), nullable=False),
+    sa.Column('task_path', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('thread_id', 'checkpoint_ns', 'checkpoint_id', 'task_id', 'idx', name=op.f('pk_graph_checkpoint_writes'))
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('graph_checkpoint_writes')
+    op.drop_table('graph_checkpoints')
@@ -0,0 +1,56 @@
+"""email outbox
+
+Revision ID: 8c2e5b1f9a07
+Revises: 3f1c9a7d2e64
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c2e5b1f9a07'
+down_revision: Union[str, Sequence[str], None] = '3f1c9a7d2e64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('email_campaigns',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('sub_subject', sa.String(), nullable=False),
+    sa.Column('sub_body', sa.String(), nullable=False),
+    sa.Column('non_sub_subject', sa.String(), nullable=False),
+    sa.Column('non_sub_body', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_email_campaigns')),
+    sa.UniqueConstraint('key', name=op.f('uq_email_campaigns_key'))
+    )
+    op.create_table('email_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('campaign_id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('subscribed', sa.Boolean(), nullable=False),
+    sa.Column('status', sa.String(), server_default='pending', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['campaign_id'], ['email_campaigns.id'], name=op.f('fk_email_outbox_campaign_id_email_campaigns'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_email_outbox')),
+    sa.UniqueConstraint('campaign_id', 'email', name=op.f('uq_email_outbox_campaign_id'))
+    )
+    op.create_index('ix_email_outbox_campaign_id_status', 'email_outbox', ['campaign_id', 'status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_email_outbox_campaign_id_status', table_name='email_outbox')
+    op.drop_table('email_outbox')
+    op.drop_table('email_campaigns')
@@ -73,4 +73,12 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], sessio
     user = result.scalar_one_or_none()
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    return user
+
+async def get_admin_user(user: User = Depends(get_current_user)):
+    if user.email not in settings.ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return user
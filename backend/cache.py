@@ -0,0 +1,145 @@
+"""
+cache.py
+
+Key/value caches with TTL expiry and LRU eviction: an in-process one bounded by entry count,
+and a persistent one backed by SQLite bounded by size.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, NamedTuple
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    stored_at: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+
+class MemoryCache:
+    """
+    In-process LRU cache holding at most `max_entries` values for `ttl` seconds.
+    """
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+
+    def get(self, key: str) -> CacheEntry | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry.age > self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: Any):
+        with self.lock:
+            self.entries[key] = CacheEntry(value, time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class DiskCache:
+    """
+    SQLite backed cache of JSON serializable values.
+    Entries older than `ttl` seconds are dropped, and the least recently used entries are
+    evicted once the stored values exceed `max_bytes`.
+    """
+    def __init__(self, path: str | Path, ttl: float, max_bytes: int):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_accessed_at ON entries (accessed_at)")
+
+    def get(self, key: str) -> CacheEntry | None:
+        """
+        Returns the entry stored under key, or None if it is missing or expired.
+        """
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT value, stored_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            self.conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return CacheEntry(json.loads(row[0]), row[1])
+
+    def set(self, key: str, value: Any):
+        """
+        Stores value under key and evicts least recently used entries beyond max_bytes.
+        """
+        data = json.dumps(value)
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, now),
+            )
+            self._evict()
+
+    def touch(self, key: str):
+        """
+        Marks an entry as freshly stored, e.g. after the origin confirmed it is unchanged.
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute("UPDATE entries SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+
+    def _evict(self):
+        self.conn.execute("DELETE FROM entries WHERE stored_at < ?", (time.time() - self.ttl,))
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self.conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+
+    def delete(self, key: str):
+        with self.lock:
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM entries")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
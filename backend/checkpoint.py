@@ -0,0 +1,193 @@
+"""
+checkpoint.py
+
+LangGraph checkpointer storing the state of every graph run in Postgres, through the same
+SQLAlchemy engine as the rest of the backend. A run that failed half way can then continue
+from its last completed node instead of scraping and generating everything again.
+"""
+
+from typing import Any, AsyncIterator, Sequence
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from backend.db import engine
+from backend.models import GraphCheckpoint, GraphCheckpointWrite
+from backend.settings import settings
+
+
+class PostgresCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    Async only checkpointer backed by the graph_checkpoints and graph_checkpoint_writes tables.
+    Checkpoints are stored whole, channel values included, since the newsletter state is small.
+    """
+    def __init__(self, engine: AsyncEngine):
+        super().__init__()
+        self.session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    def get_next_version(self, current: str | None, channel: None) -> str:
+        current_version = 0 if current is None else int(str(current).split(".")[0])
+        return f"{current_version + 1:032}"
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        configurable = config["configurable"]
+        query = select(GraphCheckpoint).where(
+            GraphCheckpoint.thread_id == configurable["thread_id"],
+            GraphCheckpoint.checkpoint_ns == configurable.get("checkpoint_ns", ""),
+        )
+        if checkpoint_id := get_checkpoint_id(config):
+            query = query.where(GraphCheckpoint.checkpoint_id == checkpoint_id)
+        else:
+            query = query.order_by(GraphCheckpoint.checkpoint_id.desc()).limit(1)
+        async with self.session_factory() as session:
+            row = (await session.execute(query)).scalar_one_or_none()
+            if row is None:
+                return None
+            return await self._checkpoint_tuple(session, row)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        query = select(GraphCheckpoint).order_by(GraphCheckpoint.checkpoint_id.desc())
+        if config is not None:
+            configurable = config["configurable"]
+            query = query.where(GraphCheckpoint.thread_id == configurable["thread_id"])
+            if "checkpoint_ns" in configurable:
+                query = query.where(GraphCheckpoint.checkpoint_ns == configurable["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                query = query.where(GraphCheckpoint.checkpoint_id == checkpoint_id)
+        if before is not None and (before_id := get_checkpoint_id(before)):
+            query = query.where(GraphCheckpoint.checkpoint_id < before_id)
+        async with self.session_factory() as session:
+            rows = (await session.execute(query)).scalars().all()
+            for row in rows:
+                if limit is not None and limit <= 0:
+                    break
+                checkpoint_tuple = await self._checkpoint_tuple(session, row)
+                # metadata is serialized, so the filter is applied here rather than in SQL
+                if filter and any(checkpoint_tuple.metadata.get(key) != value for key, value in filter.items()):
+                    continue
+                if limit is not None:
+                    limit -= 1
+                yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_data = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_data = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        values = {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint["id"],
+            "parent_checkpoint_id": configurable.get("checkpoint_id"),
+            "checkpoint_type": checkpoint_type,
+            "checkpoint": checkpoint_data,
+            "metadata_type": metadata_type,
+            "checkpoint_metadata": metadata_data,
+        }
+        statement = insert(GraphCheckpoint).values(**values).on_conflict_do_update(
+            index_elements=["thread_id", "checkpoint_ns", "checkpoint_id"],
+            set_={key: values[key] for key in ("checkpoint_type", "checkpoint", "metadata_type", "checkpoint_metadata")},
+        )
+        async with self.session_factory() as session:
+            await session.execute(statement)
+            await session.commit()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        if not writes:
+            return
+        configurable = config["configurable"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            value_type, value_data = self.serde.dumps_typed(value)
+            rows.append({
+                "thread_id": configurable["thread_id"],
+                "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+                "checkpoint_id": configurable["checkpoint_id"],
+                "task_id": task_id,
+                "idx": WRITES_IDX_MAP.get(channel, idx),
+                "channel": channel,
+                "value_type": value_type,
+                "value": value_data,
+                "task_path": task_path,
+            })
+        statement = insert(GraphCheckpointWrite).values(rows)
+        index_elements = ["thread_id", "checkpoint_ns", "checkpoint_id", "task_id", "idx"]
+        # special writes (errors, interrupts) replace the previous ones, regular writes are kept once
+        if all(channel in WRITES_IDX_MAP for channel, _ in writes):
+            statement = statement.on_conflict_do_update(
+                index_elements=index_elements,
+                set_={"channel": statement.excluded.channel, "value_type": statement.excluded.value_type, "value": statement.excluded.value},
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=index_elements)
+        async with self.session_factory() as session:
+            await session.execute(statement)
+            await session.commit()
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        async with self.session_factory() as session:
+            await session.execute(delete(GraphCheckpointWrite).where(GraphCheckpointWrite.thread_id == thread_id))
+            await session.execute(delete(GraphCheckpoint).where(GraphCheckpoint.thread_id == thread_id))
+            await session.commit()
+
+    async def _checkpoint_tuple(self, session, row: GraphCheckpoint) -> CheckpointTuple:
+        writes = (await session.execute(
+            select(GraphCheckpointWrite).where(
+                GraphCheckpointWrite.thread_id == row.thread_id,
+                GraphCheckpointWrite.checkpoint_ns == row.checkpoint_ns,
+                GraphCheckpointWrite.checkpoint_id == row.checkpoint_id,
+            ).order_by(GraphCheckpointWrite.task_id, GraphCheckpointWrite.idx)
+        )).scalars().all()
+        parent_config = None
+        if row.parent_checkpoint_id:
+            parent_config = {"configurable": {"thread_id": row.thread_id, "checkpoint_ns": row.checkpoint_ns, "checkpoint_id": row.parent_checkpoint_id}}
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": row.thread_id, "checkpoint_ns": row.checkpoint_ns, "checkpoint_id": row.checkpoint_id}},
+            checkpoint=self.serde.loads_typed((row.checkpoint_type, row.checkpoint)),
+            metadata=self.serde.loads_typed((row.metadata_type, row.checkpoint_metadata)),
+            parent_config=parent_config,
+            pending_writes=[(write.task_id, write.channel, self.serde.loads_typed((write.value_type, write.value))) for write in writes],
+        )
+
+
+_checkpointer: PostgresCheckpointSaver | None = None
+
+def get_checkpointer() -> PostgresCheckpointSaver | None:
+    """
+    Returns the shared checkpointer, or None if GRAPH_CHECKPOINTS_ENABLED is off.
+    """
+    global _checkpointer
+    if _checkpointer is None and settings.GRAPH_CHECKPOINTS_ENABLED:
+        _checkpointer = PostgresCheckpointSaver(engine)
+    return _checkpointer
@@ -0,0 +1,92 @@
+"""
+dedup.py
+
+Near-duplicate detection for syndicated news with MinHash signatures and LSH banding.
+Only articles sharing an LSH bucket are compared, so clustering stays sub-quadratic
+in the number of posts.
+"""
+
+import re
+import zlib
+from collections import defaultdict
+from typing import Callable, TypeVar
+import numpy as np
+
+T = TypeVar("T")
+
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.default_rng(20250813)
+_PERM_A = _rng.integers(1, _MERSENNE_PRIME, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _MERSENNE_PRIME, NUM_PERM, dtype=np.uint64)
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """
+    Hashes of the word `size`-grams of text.
+    """
+    words = _WORD_PATTERN.findall(text.lower())
+    grams = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+    return np.fromiter((zlib.crc32(gram.encode()) for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+def minhash(text: str) -> np.ndarray:
+    """
+    MinHash signature of text, NUM_PERM values.
+    """
+    hashes = shingles(text)
+    # uint64 overflow wraps around, which is fine for hashing
+    permuted = ((np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME) & _MAX_HASH
+    return permuted.min(axis=0)
+
+
+def near_duplicate_clusters(texts: list[str], threshold: float) -> list[list[int]]:
+    """
+    Groups indexes of texts whose estimated Jaccard similarity is at least threshold.
+    Clusters are ordered by their first index, and so are the indexes inside them.
+    """
+    if not texts:
+        return []
+    signatures = np.stack([minhash(text) for text in texts])
+    parent = list(range(len(texts)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    buckets: dict[tuple, list[int]] = defaultdict(list)
+    for band in range(BANDS):
+        rows = signatures[:, band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        for i, row in enumerate(rows):
+            buckets[(band, row.tobytes())].append(i)
+
+    checked = set()
+    for members in buckets.values():
+        for position, i in enumerate(members):
+            for j in members[position + 1:]:
+                if (i, j) in checked:
+                    continue
+                checked.add((i, j))
+                if find(i) != find(j) and np.mean(signatures[i] == signatures[j]) >= threshold:
+                    parent[max(find(i), find(j))] = min(find(i), find(j))
+
+    clusters: dict[int, list[int]] = defaultdict(list)
+    for i in range(len(texts)):
+        clusters[find(i)].append(i)
+    return sorted(clusters.values())
+
+
+def dedupe(items: list[T], text_of: Callable[[T], str], threshold: float) -> list[T]:
+    """
+    Keeps the first item of every near-duplicate cluster, in the original order.
+    """
+    clusters = near_duplicate_clusters([text_of(item) for item in items], threshold)
+    return [items[cluster[0]] for cluster in clusters]
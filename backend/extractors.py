@@ -0,0 +1,170 @@
+"""
+extractors.py
+
+Backends that extract the readable text of a news page. All of them follow the same rules:
+script/style/footer/nav/aside/noscript elements are dropped, the first remaining <article> wins
+and falls back to the whole document, and text nodes are stripped and joined with a space.
+"""
+
+from html.parser import HTMLParser
+from typing import Callable
+from bs4 import BeautifulSoup
+
+SKIP_TAGS = ("script", "style", "footer", "nav", "aside", "noscript")
+
+# same list as bs4's HTMLTreeBuilder.empty_element_tags, these never hold text
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem", "meta",
+    "param", "source", "track", "wbr", "basefont", "bgsound", "command", "frame", "image", "isindex",
+    "nextid", "spacer",
+}
+
+
+def extract_text_soup(html: str) -> str:
+    """
+    Reference extractor building a full BeautifulSoup tree with html.parser.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(list(SKIP_TAGS)):
+        tag.decompose()
+    article = soup.find("article")
+    if article:
+        out_text = article.get_text(" ", strip=True)
+    else:
+        out_text = soup.get_text(" ", strip=True)
+    return out_text
+
+
+class _ArticleFound(Exception):
+    pass
+
+
+class _StreamingTextParser(HTMLParser):
+    """
+    Tokenizes the page once without building a tree. Text under skipped tags is ignored,
+    and parsing stops as soon as the first <article> is closed.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack: list[str] = []
+        self.skip_depth = 0
+        self.article_depth: int | None = None
+        self.buffer: list[str] = []
+        self.document_text: list[str] = []
+        self.article_text: list[str] = []
+        # void tags seen as <tag>, whose explicit end tag bs4 swallows without splitting the text
+        self.closed_void: list[str] = []
+
+    def flush(self):
+        if not self.buffer:
+            return
+        text = "".join(self.buffer).strip()
+        self.buffer.clear()
+        if not text or self.skip_depth:
+            return
+        if self.article_depth is not None:
+            self.article_text.append(text)
+        else:
+            self.document_text.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        self.flush()
+        if tag in VOID_TAGS:
+            self.closed_void.append(tag)
+            return
+        self.stack.append(tag)
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag == "article" and self.article_depth is None and not self.skip_depth:
+            self.article_depth = len(self.stack)
+
+    def handle_startendtag(self, tag, attrs):
+        self.flush()
+
+    def handle_endtag(self, tag):
+        if tag in self.closed_void:
+            # e.g. </br> after <br>: no node boundary, "b</br>c" stays one text node
+            self.closed_void.remove(tag)
+            return
+        self.flush()
+        # like bs4, an end tag closes the most recent matching open tag and is ignored otherwise
+        if tag not in self.stack:
+            return
+        while self.stack:
+            name = self.stack.pop()
+            if name in SKIP_TAGS:
+                self.skip_depth -= 1
+            if self.article_depth is not None and len(self.stack) < self.article_depth:
+                raise _ArticleFound
+            if name == tag:
+                break
+
+    def handle_data(self, data):
+        self.buffer.append(data)
+
+    def handle_comment(self, data):
+        self.flush()
+
+    def handle_decl(self, decl):
+        self.flush()
+
+    def handle_pi(self, data):
+        self.flush()
+
+    def unknown_decl(self, data):
+        self.flush()
+
+
+def extract_text_stream(html: str) -> str:
+    """
+    Streaming extractor on top of the stdlib tokenizer; no tree is built.
+    """
+    parser = _StreamingTextParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except _ArticleFound:
+        pass
+    parser.flush()
+    if parser.article_depth is not None:
+        return " ".join(parser.article_text)
+    return " ".join(parser.document_text)
+
+
+def extract_text_lxml(html: str) -> str:
+    """
+    Extractor using libxml2's HTML parser. Requires the optional lxml package.
+    """
+    from lxml import etree
+    from lxml import html as lxml_html
+
+    if not html.strip():
+        return ""
+    try:
+        root = lxml_html.document_fromstring(html)
+    except ValueError:
+        # str input with an XML encoding declaration
+        root = lxml_html.document_fromstring(html.encode("utf-8"))
+    for node in root.iter(etree.Comment, etree.ProcessingInstruction, *SKIP_TAGS):
+        # keep the text around removed nodes as separate text nodes, as html.parser does
+        node.tail = " " + (node.tail or "")
+    etree.strip_elements(root, etree.Comment, etree.ProcessingInstruction, *SKIP_TAGS, with_tail=False)
+    article = root.find(".//article")
+    node = article if article is not None else root
+    return " ".join(text for text in (chunk.strip() for chunk in node.itertext()) if text)
+
+
+EXTRACTORS: dict[str, Callable[[str], str]] = {
+    "soup": extract_text_soup,
+    "stream": extract_text_stream,
+    "lxml": extract_text_lxml,
+}
+
+def get_extractor(name: str) -> Callable[[str], str]:
+    """
+    Returns the extractor backend registered under name.
+    """
+    try:
+        return EXTRACTORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown HTML extractor {name!r}, expected one of {sorted(EXTRACTORS)}")
@@ -1,29 +1,73 @@
-import json
 import asyncio
+from datetime import date
+from langchain_core.runnables import RunnableConfig
 from langchain_ollama import ChatOllama
-from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, START, END
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langchain_core.messages import HumanMessage, SystemMessage
-from backend.tools import fetch_news_api, send_email
+from backend.tools import afetch_news_api
+from backend.outbox import send_campaign
 from backend.state import AgentState
-from backend.prompts import writer_system_prompt, marketer_non_sub_system_prompt, marketer_sub_system_prompt, validator_system_prompt
+from backend.prompts import writer_system_prompt, marketer_non_sub_system_prompt, marketer_sub_system_prompt, validator_system_prompt, summarizer_system_prompt
 from backend.settings import settings
+from backend.llm import get_route_models, ainvoke_with_fallbacks
+from backend.resilience import get_llm_policy
+from backend.structured import ainvoke_structured_with_fallbacks, strip_think, NewsletterOutput, EmailOutput
+from backend.packing import pack_articles, truncate_to_tokens, CHARS_PER_TOKEN
+from backend.dedup import dedupe
 from langgraph.prebuilt import create_react_agent
 from backend.db import get_pg_async_session
-from backend.models import Newsletter, User
-from sqlalchemy import select
+from backend.models import Newsletter
 from stripe_agent_toolkit.langchain.toolkit import StripeAgentToolkit
 
 
-def list_trending_news(state: AgentState) -> AgentState:
+async def list_trending_news(state: AgentState) -> AgentState:
     """
     Langgraph node that finds trending news 
     """
-    response = fetch_news_api(state.country)
+    response = await afetch_news_api(state.country, limit=settings.NEWSLETTER_ARTICLE_COUNT)
     state.trending_news = response["trending_news"]
+    state.article_summaries = None
+    if isinstance(state.trending_news, list):
+        # the same wire story often appears with a different title on each site
+        state.trending_news = dedupe(state.trending_news, lambda news: news["content"], settings.DEDUP_THRESHOLD)
     return state
 
-def generate_newsletter(state: AgentState) -> AgentState:
+async def summarize_articles(state: AgentState) -> dict:
+    """
+    Langgraph node that summarizes every article concurrently with the light model (map step),
+    so that the newsletter can be written from many articles in a bounded prompt.
+    An article whose summary fails is represented by its lead sentences instead.
+    """
+    chat_models = get_route_models("summarize_articles", temperature=0)
+    policy = get_llm_policy("summarize_articles")
+    semaphore = asyncio.Semaphore(settings.NEWSLETTER_SUMMARY_CONCURRENCY)
+    max_words = settings.NEWSLETTER_SUMMARY_TOKENS * CHARS_PER_TOKEN // 6
+
+    async def summarize(news: dict) -> dict:
+        content = truncate_to_tokens(news["content"], settings.NEWSLETTER_SUMMARY_INPUT_TOKENS)
+        user_message = [SystemMessage(content=summarizer_system_prompt.format(title=news["title"], content=content, max_words=max_words)), HumanMessage(content="Summarize the article.")]
+        async with semaphore:
+            try:
+                result = await ainvoke_with_fallbacks(chat_models, user_message, policy)
+                summary = strip_think(result.content) or content
+            except Exception as e:
+                print(f"Summary of {news.get('url')} failed: {e!r}")
+                summary = content
+        return {**news, "content": truncate_to_tokens(summary, settings.NEWSLETTER_SUMMARY_TOKENS)}
+
+    articles = state.trending_news[:settings.NEWSLETTER_ARTICLE_COUNT]
+    return {"article_summaries": await asyncio.gather(*(summarize(news) for news in articles))}
+
+def route_curation(state: AgentState) -> str:
+    """
+    Chooses between writing from the articles directly and summarizing them first.
+    """
+    if settings.NEWSLETTER_CURATION_MODE == "map_reduce" and state.trending_news:
+        return "summarize_articles"
+    return "generate_newsletter"
+
+async def generate_newsletter(state: AgentState) -> AgentState:
     """
     Langgraph node that generates newsletter
     """
@@ -34,43 +78,37 @@ def generate_newsletter(state: AgentState) -> AgentState:
     #     num_ctx=4096,
     #     format="json"
     #     )
-    chat_openai = ChatOpenAI(
-        model=settings.OPENROUTER_MODEL, 
-        api_key=settings.OPENROUTER_API_KEY,
-        base_url="https://openrouter.ai/api/v1",
-    )
-    news_str = "\n".join(f"<trending_news> Title: {news['title']} \nContent: {news['content']}</trending_news>" for news in state.trending_news[:3])
+    chat_models = get_route_models("generate_newsletter")
+    # in map-reduce mode the newsletter is written from the summaries (reduce step)
+    articles = state.article_summaries or state.trending_news[:settings.NEWSLETTER_ARTICLE_COUNT]
+    articles = pack_articles(articles, settings.NEWSLETTER_CONTEXT_TOKENS)
+    news_str = "\n".join(f"<trending_news> Title: {news['title']} \nContent: {news['content']}</trending_news>" for news in articles)
     user_message = [SystemMessage(content=writer_system_prompt.format(news=news_str)), HumanMessage(content="Using the given trending news, write a newsletter")]
-    result = chat_openai.invoke(user_message)
-    try:
-        result_json = json.loads(result.content)
-        state.newsletter_title = result_json["Title"]
-        state.newsletter_content = result_json["Content"]
-    except (json.JSONDecodeError, KeyError):
+    output, raw_content = await ainvoke_structured_with_fallbacks(chat_models, user_message, NewsletterOutput, stream_node="generate_newsletter", policy=get_llm_policy("generate_newsletter"))
+    if output is not None:
+        state.newsletter_title = output.Title
+        state.newsletter_content = output.Content
+    else:
         state.newsletter_title = "Today's Newsletter"
-        state.newsletter_content = result.content
+        state.newsletter_content = raw_content
     return state
 
-def fix_json(state: AgentState) -> AgentState:
+async def fix_json(state: AgentState) -> AgentState:
     """
     Langgraph node that fixes json format if it's malformatted.
+    Most broken answers are already repaired locally in generate_newsletter, so this LLM round trip
+    only happens when that failed.
     """
     if state.newsletter_title == "Today's Newsletter":
-        chat_openai = ChatOpenAI(
-            model=settings.OPENROUTER_MODEL, 
-            api_key=settings.OPENROUTER_API_KEY,
-            base_url="https://openrouter.ai/api/v1",
-            temperature=0,
-        )
+        chat_models = get_route_models("fix_json", temperature=0)
         user_message = [SystemMessage(content=validator_system_prompt.format(news_content=state.newsletter_content)), HumanMessage(content="Fix the malformated Json and return in proper Json format.")]
-        result = chat_openai.invoke(user_message)
-        try:
-            result_json = json.loads(result.content)
-            state.newsletter_title = result_json["Title"]
-            state.newsletter_content = result_json["Content"]
-        except (json.JSONDecodeError, KeyError):
+        output, raw_content = await ainvoke_structured_with_fallbacks(chat_models, user_message, NewsletterOutput, policy=get_llm_policy("fix_json"))
+        if output is not None:
+            state.newsletter_title = output.Title
+            state.newsletter_content = output.Content
+        else:
             state.newsletter_title = "Today's Newsletter (Sorry for the broken newsletter body😣)"
-            state.newsletter_content = result.content
+            state.newsletter_content = raw_content
     return state
 
 
@@ -89,11 +127,11 @@ async def save_newsletter(state: AgentState) -> AgentState:
     return state
 
 
-def generate_email_for_sub(state: AgentState) -> AgentState:
+async def generate_email_for_sub(state: AgentState) -> dict:
     """
-    Langgraph node that generates a promotion email for subscriber
+    Langgraph node that generates a promotion email for subscriber.
+    Runs in parallel with generate_email_for_non_sub, so it only returns the fields it owns.
     """
-    state.agent_type = "marketing"
     # If you use local Ollama, uncomment this
     # chat_ollama = ChatOllama(
     #     base_url=settings.OLLAMA_BASE_URL, 
@@ -101,25 +139,21 @@ def generate_email_for_sub(state: AgentState) -> AgentState:
     #     num_ctx=4096,
     #     format="json"
     #     )
-    chat_openai = ChatOpenAI(
-        model=settings.OPENROUTER_MODEL, 
-        api_key=settings.OPENROUTER_API_KEY,
-        base_url="https://openrouter.ai/api/v1",
-    )
+    chat_models = get_route_models("generate_email_for_sub")
     user_message = [SystemMessage(content=marketer_non_sub_system_prompt.format(newsletter=state.newsletter_content)), HumanMessage(content="Using the generated newsletter, write a email for our subscribers.")]
-    result = chat_openai.invoke(user_message)
-    try:
-        result_json = json.loads(result.content)
-        state.email_sub_subject = result_json["Subject"]
-        state.email_sub_body = result_json["HTML"]
-    except (json.JSONDecodeError, KeyError):
-        state.email_sub_subject = "Thank you for reading our newsletter💌"
-        state.email_sub_body = result.content
-    return state
+    output, raw_content = await ainvoke_structured_with_fallbacks(chat_models, user_message, EmailOutput, policy=get_llm_policy("generate_email_for_sub"))
+    if output is not None:
+        email_sub_subject = output.Subject
+        email_sub_body = output.HTML
+    else:
+        email_sub_subject = "Thank you for reading our newsletter💌"
+        email_sub_body = raw_content
+    return {"agent_type": "marketing", "email_sub_subject": email_sub_subject, "email_sub_body": email_sub_body}
 
-def generate_email_for_non_sub(state: AgentState) -> AgentState:
+async def generate_email_for_non_sub(state: AgentState) -> dict:
     """
-    Langgraph node that generates an email for non subscriber
+    Langgraph node that generates an email for non subscriber.
+    Runs in parallel with generate_email_for_sub, so it only returns the fields it owns.
     """
     # If you use local Ollama, uncomment this
     # chat_ollama = ChatOllama(
@@ -128,40 +162,37 @@ def generate_email_for_non_sub(state: AgentState) -> AgentState:
     #     num_ctx=4096,
     #     format="json"
     #     )
-    chat_openai = ChatOpenAI(
-        model=settings.OPENROUTER_MODEL, 
-        api_key=settings.OPENROUTER_API_KEY,
-        base_url="https://openrouter.ai/api/v1",
-    )
+    chat_models = get_route_models("generate_email_for_non_sub")
     user_message = [SystemMessage(content=marketer_non_sub_system_prompt.format(newsletter=state.newsletter_content)), HumanMessage(content="Using the generated newsletter, write a promotion email for our non-subscribers.")]
-    result = chat_openai.invoke(user_message)
-    try:
-        result_json = json.loads(result.content)
-        state.email_non_sub_subject = result_json["Subject"]
-        state.email_non_sub_body = result_json["HTML"]
-    except (json.JSONDecodeError, KeyError):
-        state.email_non_sub_subject = "Join our newsletter family🔥"
-        state.email_non_sub_body = result.content
-    return state
+    output, raw_content = await ainvoke_structured_with_fallbacks(chat_models, user_message, EmailOutput, policy=get_llm_policy("generate_email_for_non_sub"))
+    if output is not None:
+        email_non_sub_subject = output.Subject
+        email_non_sub_body = output.HTML
+    else:
+        email_non_sub_subject = "Join our newsletter family🔥"
+        email_non_sub_body = raw_content
+    return {"email_non_sub_subject": email_non_sub_subject, "email_non_sub_body": email_non_sub_body}
 
-async def send_email_to_users(state: AgentState) -> AgentState:
+def newsletter_thread_id(country: str, day: date | None = None) -> str:
     """
-    Langgraph node that sends daily email
+    Checkpoint thread of the daily run for a country, so that a rerun on the same day can resume it.
     """
-    async with get_pg_async_session() as session:
-        result = await session.execute(select(User.email, User.is_subscribed))
-        all_users = result.all()
-    for email, subscribed in all_users:
-        if subscribed:
-            await asyncio.to_thread(send_email, email, state.email_sub_subject, state.email_sub_body)
-        else: 
-            await asyncio.to_thread(send_email, email, state.email_non_sub_subject, state.email_non_sub_body)
-        print(email, subscribed)
+    return f"newsletter-{country}-{(day or date.today()).isoformat()}"
+
+async def send_email_to_users(state: AgentState, config: RunnableConfig) -> AgentState:
+    """
+    Langgraph node that records the daily email of every user in the outbox, then delivers it.
+    The campaign is keyed by the run's thread, so a resumed run only sends what is still pending,
+    and a fresh run on the same day fails here with CampaignConflict rather than emailing
+    everyone a second newsletter.
+    """
+    key = config.get("configurable", {}).get("thread_id") or newsletter_thread_id(state.country)
+    await send_campaign(key, state.email_sub_subject, state.email_sub_body, state.email_non_sub_subject, state.email_non_sub_body)
     return state
 
 
 # Unused node, generated just for tool calling
-def charge_subscription_fee(state: AgentState) -> AgentState:
+async def charge_subscription_fee(state: AgentState) -> AgentState:
     """
     Langgraph node that charges monthly subscription fee, $1/month
     """
@@ -193,7 +224,7 @@ def charge_subscription_fee(state: AgentState) -> AgentState:
         of $1.
     """,
     }
-    state.billing_result = langgraph_agent_executor.invoke(input_state)
+    state.billing_result = await asyncio.wait_for(langgraph_agent_executor.ainvoke(input_state), timeout=settings.LLM_TIMEOUT)
     state.subscribed = True
     return state
 
@@ -201,6 +232,7 @@ builder = StateGraph(AgentState)
 builder.add_node("charge_subscription_fee", charge_subscription_fee)
 builder.add_node("generate_newsletter", generate_newsletter)
 builder.add_node("list_trending_news", list_trending_news)
+builder.add_node("summarize_articles", summarize_articles)
 builder.add_node("fix_json", fix_json)
 builder.add_node("save_newsletter", save_newsletter)
 builder.add_node("generate_email_for_sub", generate_email_for_sub)
@@ -208,17 +240,23 @@ builder.add_node("generate_email_for_non_sub", generate_email_for_non_sub)
 builder.add_node("send_email_to_users", send_email_to_users)
 
 builder.add_edge(START, "list_trending_news")
-builder.add_edge("list_trending_news", "generate_newsletter")
+builder.add_conditional_edges("list_trending_news", route_curation, ["summarize_articles", "generate_newsletter"])
+builder.add_edge("summarize_articles", "generate_newsletter")
 builder.add_edge("generate_newsletter", "fix_json")
 builder.add_edge("fix_json", "save_newsletter")
+# both marketing emails only read the newsletter, so they are generated concurrently
 builder.add_edge("save_newsletter", "generate_email_for_sub")
-builder.add_edge("generate_email_for_sub", "generate_email_for_non_sub")
-builder.add_edge("generate_email_for_non_sub", "send_email_to_users")
+builder.add_edge("save_newsletter", "generate_email_for_non_sub")
+builder.add_edge(["generate_email_for_sub", "generate_email_for_non_sub"], "send_email_to_users")
 builder.add_edge("send_email_to_users", END)
 graph = builder.compile()
 
-def build_curation_agent():
+def build_curation_agent(checkpointer: BaseCheckpointSaver | None = None, interrupt_before: list[str] | None = None):
     """
-    Build the Langgraph agent for newsletter generation and marketing
+    Build the Langgraph agent for newsletter generation and marketing.
+    With a checkpointer, every run needs a thread_id and can be resumed after a failure.
+    interrupt_before stops runs before those nodes, and needs a checkpointer.
     """
-    return graph
\ No newline at end of file
+    if checkpointer is None and interrupt_before is None:
+        return graph
+    return builder.compile(checkpointer=checkpointer, interrupt_before=interrupt_before)
\ No newline at end of file
@@ -0,0 +1,252 @@
+"""
+llm.py
+
+Process-wide registry of chat model clients. Clients are created lazily, once per event loop and
+model/temperature/base URL, and share a keep-alive HTTP connection pool per loop and base URL.
+Responses are cached by content: identical model parameters and messages return the
+stored answer instead of calling the model again.
+"""
+
+import asyncio
+import hashlib
+import threading
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+import httpx
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+from langchain_core.runnables import Runnable
+from langchain_core.messages import BaseMessage
+from langchain_openai import ChatOpenAI
+from backend.cache import DiskCache, MemoryCache
+from backend.resilience import LLMPolicy, acall_with_policy, get_llm_policy
+from backend.settings import settings
+
+
+# keys served or stored by the cache inside recording_cache_keys blocks
+_recorded_keys: ContextVar[set[str] | None] = ContextVar("recorded_llm_cache_keys", default=None)
+
+
+class TieredLLMCache(BaseCache):
+    """
+    LangChain LLM cache keyed by a hash of the model parameters and the rendered prompt.
+    Lookups hit an in-process LRU first, then the SQLite tier which survives restarts.
+    """
+    def __init__(self, memory: MemoryCache, disk: DiskCache | None = None):
+        self.memory = memory
+        self.disk = disk
+
+    @staticmethod
+    def key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode()).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        key = self.key(prompt, llm_string)
+        entry = self.memory.get(key)
+        if entry is not None:
+            self._record(key)
+            return entry.value
+        if self.disk is None:
+            return None
+        entry = self.disk.get(key)
+        if entry is None:
+            return None
+        generations = loads(entry.value, allowed_objects="core")
+        self.memory.set(key, generations)
+        self._record(key)
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self.key(prompt, llm_string)
+        self.memory.set(key, return_val)
+        if self.disk is not None:
+            self.disk.set(key, dumps(return_val))
+        self._record(key)
+
+    def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    @staticmethod
+    def _record(key: str):
+        keys = _recorded_keys.get()
+        if keys is not None:
+            keys.add(key)
+
+    def clear(self, **kwargs: Any) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+_llm_cache: TieredLLMCache | None = None
+
+def get_llm_cache() -> TieredLLMCache | None:
+    """
+    Returns the process-wide LLM response cache, or None if LLM_CACHE_ENABLED is off.
+    """
+    global _llm_cache
+    if _llm_cache is None and settings.LLM_CACHE_ENABLED:
+        _llm_cache = TieredLLMCache(
+            MemoryCache(settings.LLM_CACHE_MEMORY_ENTRIES, ttl=settings.LLM_CACHE_TTL),
+            DiskCache(settings.LLM_CACHE_PATH, ttl=settings.LLM_CACHE_TTL, max_bytes=settings.LLM_CACHE_MAX_BYTES) if settings.LLM_CACHE_PATH else None,
+        )
+    return _llm_cache
+
+
+@contextmanager
+def recording_cache_keys() -> Iterator[set[str]]:
+    """
+    Collects the keys of the cached answers served or stored by the model calls made inside the
+    block, so that evict_cached can drop them if the answer turns out to be unusable.
+    """
+    keys: set[str] = set()
+    token = _recorded_keys.set(keys)
+    try:
+        yield keys
+    finally:
+        _recorded_keys.reset(token)
+
+
+def evict_cached(keys: set[str]):
+    """
+    Removes the given answers from the LLM cache, so that the next identical call asks the model.
+    """
+    cache = get_llm_cache()
+    if cache is None:
+        return
+    for key in keys:
+        cache.delete(key)
+
+
+class _LoopClients:
+    """Chat clients and the connection pools they use, which are bound to one event loop."""
+    def __init__(self):
+        self.chat_models: dict[tuple[str, float | None, str, str], ChatOpenAI] = {}
+        self.http_clients: dict[str, httpx.AsyncClient] = {}
+
+
+_loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopClients]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _loop_clients() -> _LoopClients:
+    loop = asyncio.get_running_loop()
+    clients = _loops.get(loop)
+    if clients is None:
+        clients = _LoopClients()
+        _loops[loop] = clients
+    return clients
+
+
+def _http_client(clients: _LoopClients, base_url: str) -> httpx.AsyncClient:
+    client = clients.http_clients.get(base_url)
+    if client is None or client.is_closed:
+        # timeouts are enforced per call by ainvoke_chat
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=settings.LLM_MAX_CONNECTIONS, max_keepalive_connections=settings.LLM_MAX_CONNECTIONS),
+            timeout=None,
+        )
+        clients.http_clients[base_url] = client
+    return client
+
+
+def get_chat_model(model: str | None = None, temperature: float | None = None, base_url: str | None = None, api_key: str | None = None) -> ChatOpenAI:
+    """
+    Returns the shared OpenAI compatible chat client of the running event loop, OPENROUTER_MODEL
+    on OpenRouter by default. api_key defaults to OPENROUTER_API_KEY, only when base_url is OpenRouter's.
+    """
+    model = model or settings.OPENROUTER_MODEL
+    if base_url is None or base_url == settings.OPENROUTER_BASE_URL:
+        base_url = settings.OPENROUTER_BASE_URL
+        api_key = api_key or settings.OPENROUTER_API_KEY
+    elif api_key is None:
+        raise ValueError(f"No API key given for {base_url}")
+    key = (model, temperature, base_url, api_key)
+    with _lock:
+        clients = _loop_clients()
+        client = clients.chat_models.get(key)
+        if client is None:
+            client = ChatOpenAI(
+                model=model,
+                api_key=api_key,
+                base_url=base_url,
+                temperature=temperature,
+                # the nodes only make async calls, so only the async pool is shared and capped
+                http_async_client=_http_client(clients, base_url),
+                cache=get_llm_cache(),
+                # retries are handled by backend.resilience, with a deadline and jitter
+                max_retries=0,
+            )
+            clients.chat_models[key] = client
+        return client
+
+
+def get_light_chat_model(temperature: float | None = None) -> ChatOpenAI:
+    """
+    Returns the client of LLM_MODEL_LIGHT, served by Ollama's OpenAI compatible API unless
+    LLM_MODEL_LIGHT_BASE_URL points elsewhere, authenticated with LLM_MODEL_LIGHT_API_KEY.
+    """
+    return get_chat_model(
+        model=settings.LLM_MODEL_LIGHT,
+        temperature=temperature,
+        base_url=settings.LLM_MODEL_LIGHT_BASE_URL or f"{settings.OLLAMA_BASE_URL}/v1",
+        api_key=settings.LLM_MODEL_LIGHT_API_KEY,
+    )
+
+
+MODEL_TIERS = ("heavy", "light")
+
+def get_tier_model(tier: str, temperature: float | None = None) -> ChatOpenAI:
+    """
+    Returns the chat client of a model tier: "heavy" is OPENROUTER_MODEL, "light" is LLM_MODEL_LIGHT.
+    Unknown tiers raise ValueError.
+    """
+    if tier == "heavy":
+        return get_chat_model(temperature=temperature)
+    if tier == "light":
+        return get_light_chat_model(temperature)
+    raise ValueError(f"Unknown model tier {tier!r}, expected one of {MODEL_TIERS}")
+
+
+def get_route_models(task: str, temperature: float | None = None) -> list[ChatOpenAI]:
+    """
+    Chat clients of the tiers LLM_ROUTES assigns to task (usually a graph node), in fallback order.
+    Tasks without a route use the heavy tier.
+    """
+    return [get_tier_model(tier, temperature) for tier in settings.LLM_ROUTES.get(task, ["heavy"])]
+
+
+async def aclose_chat_models():
+    """
+    Drops the clients of the running event loop and closes their connection pools, at the end of
+    that loop. Clients of other loops are left alone.
+    """
+    with _lock:
+        clients = _loops.pop(asyncio.get_running_loop(), None)
+    if clients is not None:
+        await asyncio.gather(*(client.aclose() for client in clients.http_clients.values()))
+
+
+async def ainvoke_chat(chat_model: Runnable, messages: list[BaseMessage], timeout: float | None = None, **kwargs):
+    """
+    Awaits chat_model.ainvoke, cancelling the request once timeout seconds (LLM_TIMEOUT by default)
+    have passed. Raises TimeoutError in that case. Extra keyword arguments go to ainvoke.
+    """
+    return await asyncio.wait_for(chat_model.ainvoke(messages, **kwargs), timeout=settings.LLM_TIMEOUT if timeout is None else timeout)
+
+
+async def ainvoke_with_fallbacks(chat_models: list[Runnable], messages: list[BaseMessage], policy: LLMPolicy | None = None, **kwargs):
+    """
+    ainvoke_chat on the models in route order under policy (LLM_POLICY by default): each one is
+    retried on rate limits, server errors and stalls, and the next one takes over when it fails
+    or, with hedging, when it is too slow. The last error is raised if no model answers.
+    """
+    calls = [
+        lambda timeout, chat_model=chat_model: ainvoke_chat(chat_model, messages, timeout, **kwargs)
+        for chat_model in chat_models
+    ]
+    return await acall_with_policy(calls, policy or get_llm_policy())
@@ -0,0 +1,357 @@
+"""
+mailer.py
+
+SMTP delivery over long lived connections. Opening one costs a TLS handshake plus AUTH, which
+dominates the cost of a message, so a mailer keeps its authenticated connection across messages,
+reconnects when the server drops it, and recycles it after a number of messages.
+Bulk sends go through a pool of such connections, rate limited to what the provider accepts,
+with each campaign email encoded once by a MessageTemplate.
+"""
+
+import asyncio
+import email.policy
+import email.quoprimime
+import html
+import re
+import smtplib
+import ssl
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
+from email.utils import formatdate, make_msgid
+from urllib.parse import quote
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import AsyncIterable, Callable, Iterable
+from pydantic import BaseModel
+from backend.scraping import TokenBucket
+from backend.settings import settings
+
+
+def build_message(email: str, subject: str, html_content: str, sender: str | None = None) -> MIMEMultipart:
+    """
+    HTML email to email, from sender (EMAIL_ADDRESS by default).
+    """
+    message = MIMEMultipart("alternative")
+    message["From"] = sender or settings.EMAIL_ADDRESS
+    message["To"] = email
+    message["Subject"] = subject
+    message.attach(MIMEText(html_content, "html"))
+    return message
+
+
+class RenderedMessage:
+    """
+    An email ready to go on the wire: envelope plus the CRLF terminated bytes of the message.
+    Headers can be read like those of a Message.
+    """
+    def __init__(self, sender: str, recipient: str, headers: dict[str, str], data: bytes):
+        self.sender = sender
+        self.recipient = recipient
+        self.headers = headers
+        self.data = data
+
+    def __getitem__(self, name: str) -> str | None:
+        return self.headers.get(name)
+
+
+OutgoingMessage = Message | RenderedMessage
+
+
+def _fold(name: str, value: str) -> str:
+    if value.isascii() and len(name) + len(value) < 76 and "\r" not in value and "\n" not in value:
+        # the header registry is slow, and most headers need neither encoding nor folding
+        return f"{name}: {value}\r\n"
+    return email.policy.SMTP.header_factory(name, value).fold(policy=email.policy.SMTP)
+
+
+def _quoted_printable(text: str) -> str:
+    return email.quoprimime.body_encode(text.encode("utf-8").decode("latin-1"), eol="\r\n")
+
+
+class MessageTemplate:
+    """
+    HTML email encoded once and rendered for many recipients. The body is split on the
+    {{field}} placeholders of `fields` and its parts are quoted-printable encoded up front, so
+    rendering only encodes the recipient's headers and field values (HTML escaped), joined to
+    the parts with soft line breaks. With `unsubscribe_url` (formatted with the recipient's
+    email), messages get a List-Unsubscribe header and the {{unsubscribe_url}} field.
+    """
+    def __init__(self, subject: str, html_content: str, sender: str | None = None, fields: tuple[str, ...] = (), unsubscribe_url: str | None = None):
+        self.sender = sender or settings.EMAIL_ADDRESS
+        self.subject = subject
+        self.unsubscribe_url = unsubscribe_url
+        self.message_id_domain = self.sender.rpartition("@")[2] or None
+        if unsubscribe_url is not None:
+            fields = (*fields, "unsubscribe_url")
+        self.fields = fields
+        self.head = (
+            _fold("From", self.sender)
+            + _fold("Subject", subject)
+            + "MIME-Version: 1.0\r\n"
+            + 'Content-Type: text/html; charset="utf-8"\r\n'
+            + "Content-Transfer-Encoding: quoted-printable\r\n"
+        ).encode("ascii")
+        # odd items are the field names, even items the encoded text around them
+        parts = re.split(r"\{\{(%s)\}\}" % "|".join(map(re.escape, fields)), html_content) if fields else [html_content]
+        self.parts = [part if i % 2 else _quoted_printable(part) for i, part in enumerate(parts)]
+
+    def render(self, email: str, **values: str) -> RenderedMessage:
+        """
+        The message for email, with values for the template's fields (empty when missing).
+        """
+        headers = {"From": self.sender, "To": email, "Subject": self.subject, "Message-ID": make_msgid(domain=self.message_id_domain)}
+        if self.unsubscribe_url is not None:
+            values["unsubscribe_url"] = self.unsubscribe_url.format(email=quote(email))
+            headers["List-Unsubscribe"] = f"<{values['unsubscribe_url']}>"
+        head = _fold("To", email) + _fold("Date", formatdate(usegmt=True)) + _fold("Message-ID", headers["Message-ID"])
+        if "List-Unsubscribe" in headers:
+            head += _fold("List-Unsubscribe", headers["List-Unsubscribe"])
+        body = "=\r\n".join(
+            _quoted_printable(html.escape(values.get(part, ""))) if i % 2 else part
+            for i, part in enumerate(self.parts)
+            if part or i % 2
+        )
+        data = self.head + head.encode("ascii") + b"\r\n" + body.encode("ascii") + b"\r\n"
+        return RenderedMessage(self.sender, email, headers, data)
+
+
+def _breaks_session(error: OSError) -> bool:
+    """
+    Whether the connection can't be trusted after error: socket errors and timeouts, a drop,
+    or a 421 closing the channel. Other SMTP errors leave a session smtplib already reset.
+    """
+    if isinstance(error, smtplib.SMTPServerDisconnected) or not isinstance(error, smtplib.SMTPException):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code == 421
+
+
+class SMTPMailer:
+    """
+    Sends messages over one authenticated SMTP_SSL connection, opened on first use and replaced
+    after `max_messages_per_connection` messages. Not thread safe: use one mailer per worker.
+    """
+    def __init__(self, host: str, port: int, username: str, password: str, max_messages_per_connection: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.max_messages_per_connection = max_messages_per_connection
+        self.timeout = timeout
+        self.ssl_context = ssl.create_default_context()
+        self.server: smtplib.SMTP_SSL | None = None
+        self.sent_on_connection = 0
+        self.connections = 0
+
+    def connect(self):
+        self.close()
+        server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=self.ssl_context)
+        server.ehlo()
+        server.login(self.username, self.password)
+        self.server = server
+        self.sent_on_connection = 0
+        self.connections += 1
+
+    def send(self, message: OutgoingMessage):
+        """
+        Sends message, reconnecting once if the server closed the connection in the meantime.
+        """
+        if self.server is None or self.sent_on_connection >= self.max_messages_per_connection:
+            self.connect()
+        try:
+            try:
+                self._send(message)
+            except smtplib.SMTPServerDisconnected:
+                self.connect()
+                self._send(message)
+        except OSError as e:
+            if _breaks_session(e):
+                # a late reply to this message could otherwise be read as the next one's
+                self.abort()
+            raise
+        self.sent_on_connection += 1
+
+    def _send(self, message: OutgoingMessage):
+        if isinstance(message, RenderedMessage):
+            self.server.sendmail(message.sender, [message.recipient], message.data)
+        else:
+            self.server.send_message(message)
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            # already gone, nothing to close politely
+            pass
+        self.server = None
+
+    def abort(self):
+        """
+        Drops the connection without QUIT, for when its protocol state is unknown.
+        """
+        if self.server is None:
+            return
+        try:
+            self.server.close()
+        except OSError:
+            pass
+        self.server = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    Whether sending again later may work: dropped or refused connections, timeouts and 4xx
+    replies such as 421 or 451 throttling. 5xx rejections are permanent.
+    """
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return bool(error.recipients) and all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, OSError)
+
+
+def create_mailer() -> SMTPMailer:
+    """
+    Mailer for the SMTP server and account configured in the settings.
+    """
+    return SMTPMailer(
+        settings.SMTP_HOST,
+        settings.SMTP_PORT,
+        settings.EMAIL_ADDRESS,
+        settings.EMAIL_PASSWORD,
+        max_messages_per_connection=settings.SMTP_MAX_MESSAGES_PER_CONNECTION,
+        timeout=settings.SMTP_TIMEOUT,
+    )
+
+
+class ProviderLimits(BaseModel):
+    """How many connections and messages per second an SMTP provider accepts from us."""
+    concurrency: int
+    rate_per_second: float
+
+
+def provider_limits(host: str) -> ProviderLimits:
+    """
+    Limits for host: SMTP_CONCURRENCY and SMTP_RATE_PER_SECOND when set, otherwise the
+    SMTP_PROVIDER_LIMITS entry whose key is a suffix of host, otherwise the "default" entry.
+    """
+    presets = settings.SMTP_PROVIDER_LIMITS
+    preset = next((limits for suffix, limits in presets.items() if host.endswith(suffix)), presets["default"])
+    return ProviderLimits(
+        concurrency=settings.SMTP_CONCURRENCY or preset["concurrency"],
+        rate_per_second=settings.SMTP_RATE_PER_SECOND or preset["rate_per_second"],
+    )
+
+
+class DeliveryReport(BaseModel):
+    """
+    Outcome of a bulk send.
+    """
+    sent: int = 0
+    failed: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def messages_per_second(self) -> float:
+        return self.sent / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+async def _iterate(messages: Iterable[OutgoingMessage] | AsyncIterable[OutgoingMessage]):
+    if hasattr(messages, "__aiter__"):
+        async for message in messages:
+            yield message
+    else:
+        for message in messages:
+            yield message
+
+
+async def deliver(
+    messages: Iterable[OutgoingMessage] | AsyncIterable[OutgoingMessage],
+    limits: ProviderLimits | None = None,
+    mailer_factory: Callable[[], SMTPMailer] | None = None,
+    report_every: int | None = None,
+    on_result: Callable[[OutgoingMessage, Exception | None], None] | None = None,
+) -> DeliveryReport:
+    """
+    Sends messages over `limits.concurrency` connections (provider_limits(SMTP_HOST) by default),
+    at most `limits.rate_per_second` messages per second overall. A message that fails is counted
+    and skipped, but a rejected login stops the delivery. on_result is called with each message
+    and its error, or None once sent. Prints the throughput every `report_every` messages
+    (SMTP_REPORT_EVERY).
+    """
+    limits = limits or provider_limits(settings.SMTP_HOST)
+    mailer_factory = mailer_factory or create_mailer
+    report_every = report_every or settings.SMTP_REPORT_EVERY
+    bucket = TokenBucket(limits.rate_per_second, capacity=limits.concurrency)
+    queue: asyncio.Queue[OutgoingMessage | None] = asyncio.Queue(maxsize=limits.concurrency * 2)
+    report = DeliveryReport()
+    start = time.perf_counter()
+    batch_start, batch_sent = start, 0
+    loop = asyncio.get_running_loop()
+    # smtplib blocks, so each connection lives in its own thread
+    executor = ThreadPoolExecutor(max_workers=limits.concurrency, thread_name_prefix="smtp")
+
+    def record(message: OutgoingMessage, error: Exception | None):
+        nonlocal batch_start, batch_sent
+        if on_result is not None:
+            on_result(message, error)
+        if error is None:
+            report.sent += 1
+            batch_sent += 1
+        else:
+            report.failed += 1
+        if (report.sent + report.failed) % report_every == 0:
+            now = time.perf_counter()
+            print(f"Sent {report.sent}, failed {report.failed}, batch at {batch_sent / max(now - batch_start, 1e-9):.1f} msg/s")
+            batch_start, batch_sent = now, 0
+
+    async def worker():
+        mailer = mailer_factory()
+        try:
+            while (message := await queue.get()) is not None:
+                await bucket.aacquire()
+                try:
+                    await loop.run_in_executor(executor, mailer.send, message)
+                    record(message, None)
+                except smtplib.SMTPAuthenticationError:
+                    raise
+                except Exception as e:
+                    print(f"Sending to {message['To']} failed: {e!r}")
+                    record(message, e)
+        finally:
+            await loop.run_in_executor(executor, mailer.close)
+
+    async def enqueue(message: OutgoingMessage | None):
+        # workers that died, e.g. on a rejected login, would leave a full queue waiting forever
+        put = asyncio.ensure_future(queue.put(message))
+        done, _ = await asyncio.wait([put, *workers], return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task is not put and task.exception() is not None:
+                put.cancel()
+                raise task.exception()
+
+    workers = [asyncio.create_task(worker()) for _ in range(limits.concurrency)]
+    try:
+        async for message in _iterate(messages):
+            await enqueue(message)
+        for _ in workers:
+            await enqueue(None)
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        executor.shutdown(wait=False)
+    report.elapsed_seconds = time.perf_counter() - start
+    print(f"Delivered {report.sent} emails ({report.failed} failed) in {report.elapsed_seconds:.1f}s, {report.messages_per_second:.1f} msg/s")
+    return report
@@ -1,8 +1,10 @@
 import asyncio
+import uuid
 import asyncpg
 from typing import Annotated, List
 from fastapi import FastAPI, Depends, status, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete
 import stripe
@@ -10,8 +12,11 @@ from backend.db import fastapi_async_session_dependency
 from backend.models.newsletter import Newsletter, NewsletterResponse, NewNewsletter
 from backend.models.user import User, UserEntry, UserResponse, UserSubscriptionEntry
 from backend.settings import settings
-from backend.auth import hash_password, create_access_token, verify_password, get_current_user, Token
+from backend.auth import hash_password, create_access_token, verify_password, get_current_user, get_admin_user, Token
 from backend.tools import create_stripe_customer, create_stripe_subscription_session, update_user_subscription
+from langgraph.checkpoint.memory import InMemorySaver
+from backend.graph import build_curation_agent
+from backend.streaming import astream_run_events, format_sse
 
 
 
@@ -145,6 +150,23 @@ async def create_newsletter(newsletter_data: NewNewsletter, session: AsyncSessio
     
     return new_newsletter
 
+@app.get("/admin/newsletter-runs/stream")
+async def stream_newsletter_run(country: str = "US", user: User = Depends(get_admin_user)):
+    """
+    Run a preview of the newsletter agent for a country and stream its progress as server-sent
+    events. The preview has its own thread and stops before the newsletter is saved, so it
+    never touches the daily run nor emails anyone.
+    """
+    newsletter_agent_graph = build_curation_agent(InMemorySaver(), interrupt_before=["save_newsletter"])
+    config = {"configurable": {"thread_id": f"preview-{country}-{uuid.uuid4()}"}}
+
+    async def events():
+        # a client disconnect cancels this generator, and with it the run
+        async for event, data in astream_run_events(newsletter_agent_graph, {"country": country}, config):
+            yield format_sse(event, data)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @app.post("/subscription")
 async def activate_subscription(entry: UserSubscriptionEntry, user: User = Depends(get_current_user)):
     try: 
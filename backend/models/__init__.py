@@ -1,5 +1,7 @@
 from .base import Base
 from .user import User
 from .newsletter import Newsletter, NewsletterResponse, NewNewsletter   
+from .checkpoint import GraphCheckpoint, GraphCheckpointWrite
+from .outbox import EmailCampaign, EmailOutbox
 
-__all__ = ["Base", "User", "Newsletter"]
+__all__ = ["Base", "User", "Newsletter", "GraphCheckpoint", "GraphCheckpointWrite", "EmailCampaign", "EmailOutbox"]
@@ -0,0 +1,37 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import LargeBinary, func
+from .base import Base
+from datetime import datetime
+
+
+class GraphCheckpoint(Base):
+    """
+    Serialized LangGraph checkpoint, written after every completed step of a run.
+    """
+    __tablename__ = 'graph_checkpoints'
+    thread_id: Mapped[str] = mapped_column(primary_key=True)
+    checkpoint_ns: Mapped[str] = mapped_column(primary_key=True, default="")
+    checkpoint_id: Mapped[str] = mapped_column(primary_key=True)
+    parent_checkpoint_id: Mapped[str | None] = mapped_column(nullable=True)
+    checkpoint_type: Mapped[str]
+    checkpoint: Mapped[bytes] = mapped_column(LargeBinary)
+    metadata_type: Mapped[str]
+    checkpoint_metadata: Mapped[bytes] = mapped_column(LargeBinary)
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+
+
+class GraphCheckpointWrite(Base):
+    """
+    Output of a node that finished while the rest of its step did not, so that
+    resuming the run does not execute it again.
+    """
+    __tablename__ = 'graph_checkpoint_writes'
+    thread_id: Mapped[str] = mapped_column(primary_key=True)
+    checkpoint_ns: Mapped[str] = mapped_column(primary_key=True, default="")
+    checkpoint_id: Mapped[str] = mapped_column(primary_key=True)
+    task_id: Mapped[str] = mapped_column(primary_key=True)
+    idx: Mapped[int] = mapped_column(primary_key=True)
+    channel: Mapped[str]
+    value_type: Mapped[str]
+    value: Mapped[bytes] = mapped_column(LargeBinary)
+    task_path: Mapped[str] = mapped_column(default="")
@@ -0,0 +1,40 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import ForeignKey, Index, UniqueConstraint, func
+from .base import Base
+from datetime import datetime
+
+
+class EmailCampaign(Base):
+    """
+    One day's marketing emails for a country; key makes reruns reuse the same campaign.
+    """
+    __tablename__ = 'email_campaigns'
+    id: Mapped[int] = mapped_column(primary_key=True)
+    key: Mapped[str] = mapped_column(unique=True)
+    sub_subject: Mapped[str]
+    sub_body: Mapped[str]
+    non_sub_subject: Mapped[str]
+    non_sub_body: Mapped[str]
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+
+
+class EmailOutbox(Base):
+    """
+    One recipient of a campaign and the delivery status of their email:
+    pending, sending (claimed by a worker), sent or failed.
+    """
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        UniqueConstraint('campaign_id', 'email'),
+        Index('ix_email_outbox_campaign_id_status', 'campaign_id', 'status'),
+    )
+    id: Mapped[int] = mapped_column(primary_key=True)
+    campaign_id: Mapped[int] = mapped_column(ForeignKey('email_campaigns.id', ondelete='CASCADE'))
+    email: Mapped[str]
+    subscribed: Mapped[bool]
+    status: Mapped[str] = mapped_column(default="pending", server_default="pending")
+    attempts: Mapped[int] = mapped_column(default=0, server_default="0")
+    last_error: Mapped[str | None] = mapped_column(nullable=True)
+    claimed_at: Mapped[datetime | None] = mapped_column(nullable=True)
+    sent_at: Mapped[datetime | None] = mapped_column(nullable=True)
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
@@ -0,0 +1,226 @@
+"""
+outbox.py
+
+Durable delivery of the marketing emails. The graph records a campaign with one outbox row per
+recipient, streamed from the users table, while workers claim pending rows in batches with
+FOR UPDATE SKIP LOCKED, send them and mark them sent or failed, or pending again after a
+transient SMTP error. Reruns and extra worker processes only pick up what is still pending, so
+nobody gets a campaign twice; rows claimed by a worker that died are picked up again once their
+lease has expired.
+"""
+
+import argparse
+import asyncio
+from datetime import timedelta
+from sqlalchemy import and_, bindparam, case, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from backend.db import get_pg_async_session
+from backend.mailer import DeliveryReport, MessageTemplate, OutgoingMessage, ProviderLimits, deliver, is_transient_error, provider_limits
+from backend.models import EmailCampaign, EmailOutbox, User
+from backend.settings import settings
+
+
+class CampaignConflict(Exception):
+    """Raised when a campaign key is reused with different emails."""
+
+
+async def create_campaign(key: str, sub_subject: str, sub_body: str, non_sub_subject: str, non_sub_body: str) -> int:
+    """
+    Id of the campaign with key, created with the given emails unless it already exists.
+    There is one campaign per key (a country and day for the graph), so that nobody gets the
+    daily email twice: an existing campaign is only reused with the same emails, to finish
+    sending it. Different emails raise CampaignConflict instead of being dropped silently.
+    """
+    emails = {"sub_subject": sub_subject, "sub_body": sub_body, "non_sub_subject": non_sub_subject, "non_sub_body": non_sub_body}
+    async with get_pg_async_session() as session:
+        await session.execute(insert(EmailCampaign).values(key=key, **emails).on_conflict_do_nothing(index_elements=["key"]))
+        campaign = (await session.execute(select(EmailCampaign).where(EmailCampaign.key == key))).scalar_one()
+        await session.commit()
+    changed = [field for field, value in emails.items() if getattr(campaign, field) != value]
+    if changed:
+        raise CampaignConflict(f"Campaign {key} was already created with a different {', '.join(changed)}; resume the run that created it to finish sending it")
+    return campaign.id
+
+
+async def enqueue_recipients(campaign_id: int) -> int:
+    """
+    Adds an outbox row for every user not in the campaign yet. Users are streamed from a server
+    side cursor and inserted OUTBOX_BATCH_SIZE at a time, each chunk committed right away so that
+    delivery can start on it. Returns the number of users seen.
+    """
+    seen = 0
+    async with get_pg_async_session() as read_session, get_pg_async_session() as write_session:
+        result = await read_session.stream(
+            select(User.email, User.is_subscribed).order_by(User.id).execution_options(yield_per=settings.OUTBOX_BATCH_SIZE)
+        )
+        async for users in result.partitions():
+            rows = [{"campaign_id": campaign_id, "email": email, "subscribed": subscribed} for email, subscribed in users]
+            await write_session.execute(insert(EmailOutbox).values(rows).on_conflict_do_nothing(index_elements=["campaign_id", "email"]))
+            await write_session.commit()
+            seen += len(rows)
+    return seen
+
+
+def claim_statement(campaign_id: int, batch_size: int, lease_seconds: float, retry_seconds: float = 0.0):
+    """
+    Marks up to batch_size claimable rows as sending and returns them. Rows locked by another
+    worker are skipped instead of waited for, rows put back after a transient error wait
+    retry_seconds since their last claim.
+    """
+    claimable = select(EmailOutbox.id).where(
+        EmailOutbox.campaign_id == campaign_id,
+        or_(
+            and_(
+                EmailOutbox.status == "pending",
+                or_(EmailOutbox.claimed_at.is_(None), EmailOutbox.claimed_at < func.now() - timedelta(seconds=retry_seconds)),
+            ),
+            and_(EmailOutbox.status == "sending", EmailOutbox.claimed_at < func.now() - timedelta(seconds=lease_seconds)),
+        ),
+    ).order_by(EmailOutbox.id).limit(batch_size).with_for_update(skip_locked=True)
+    return (
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(claimable.scalar_subquery()))
+        .values(status="sending", claimed_at=func.now(), attempts=EmailOutbox.attempts + 1)
+        .returning(EmailOutbox.id, EmailOutbox.email, EmailOutbox.subscribed)
+    )
+
+
+def claim_size(limits: ProviderLimits) -> int:
+    """
+    Rows claimed at once: OUTBOX_BATCH_SIZE, capped so that a batch goes out within half of its
+    lease at the provider's rate. Otherwise the last rows of a batch would expire while still
+    queued, and another worker would claim and send them again.
+    """
+    return max(1, min(settings.OUTBOX_BATCH_SIZE, int(settings.OUTBOX_LEASE_SECONDS * limits.rate_per_second / 2)))
+
+
+async def claim_batch(campaign_id: int, batch_size: int) -> list:
+    async with get_pg_async_session() as session:
+        result = await session.execute(claim_statement(campaign_id, batch_size, settings.OUTBOX_LEASE_SECONDS, settings.OUTBOX_RETRY_SECONDS))
+        rows = result.all()
+        await session.commit()
+    return rows
+
+
+async def mark_results(results: list[tuple[int, Exception | None]]):
+    """
+    Stores the outcome of sent rows: sent, back to pending after a transient error (see
+    mailer.is_transient_error) until OUTBOX_MAX_ATTEMPTS claims, or failed with the error.
+    """
+    if not results:
+        return
+    sent_ids = [row_id for row_id, error in results if error is None]
+    retries = [{"row_id": row_id, "error": repr(error)} for row_id, error in results if error is not None and is_transient_error(error)]
+    failures = [{"row_id": row_id, "error": repr(error)} for row_id, error in results if error is not None and not is_transient_error(error)]
+    outbox = EmailOutbox.__table__
+    by_id = outbox.c.id == bindparam("row_id")
+    async with get_pg_async_session() as session:
+        if sent_ids:
+            await session.execute(update(outbox).where(outbox.c.id.in_(sent_ids)).values(status="sent", sent_at=func.now()))
+        if retries:
+            status = case((outbox.c.attempts >= settings.OUTBOX_MAX_ATTEMPTS, "failed"), else_="pending")
+            await session.execute(update(outbox).where(by_id).values(status=status, last_error=bindparam("error")), retries)
+        if failures:
+            await session.execute(update(outbox).where(by_id).values(status="failed", last_error=bindparam("error")), failures)
+        await session.commit()
+
+
+async def release_rows(row_ids: list[int]):
+    """
+    Puts claimed rows that were not sent back to pending, e.g. after the SMTP login failed.
+    """
+    if not row_ids:
+        return
+    async with get_pg_async_session() as session:
+        await session.execute(update(EmailOutbox).where(EmailOutbox.id.in_(row_ids), EmailOutbox.status == "sending").values(status="pending"))
+        await session.commit()
+
+
+async def drain_campaign(campaign_id: int, enqueuing: asyncio.Task | None = None) -> DeliveryReport:
+    """
+    Claims and sends the campaign's pending emails batch after batch until none is left, or,
+    while the enqueuing task is still running, until it is done and none is left.
+    Several workers can drain the same campaign at once.
+    """
+    async with get_pg_async_session() as session:
+        campaign = (await session.execute(select(EmailCampaign).where(EmailCampaign.id == campaign_id))).scalar_one()
+    # each body is encoded once for the whole campaign
+    templates = {
+        True: MessageTemplate(campaign.sub_subject, campaign.sub_body, unsubscribe_url=settings.EMAIL_UNSUBSCRIBE_URL),
+        False: MessageTemplate(campaign.non_sub_subject, campaign.non_sub_body, unsubscribe_url=settings.EMAIL_UNSUBSCRIBE_URL),
+    }
+    limits = provider_limits(settings.SMTP_HOST)
+    batch_size = claim_size(limits)
+    row_ids: dict[str, int] = {}
+    results: list[tuple[int, Exception | None]] = []
+
+    def on_result(message: OutgoingMessage, error: Exception | None):
+        results.append((row_ids.pop(message["To"]), error))
+
+    async def flush_results():
+        done = results[:]
+        del results[:len(done)]
+        await mark_results(done)
+
+    async def messages():
+        while True:
+            # checked before claiming: rows committed while the claim runs are picked up next time
+            finished = enqueuing is None or enqueuing.done()
+            rows = await claim_batch(campaign_id, batch_size)
+            if not rows:
+                if finished:
+                    break
+                # recipients are still being added, check again once more are committed
+                await asyncio.wait([enqueuing], timeout=settings.OUTBOX_POLL_SECONDS)
+                continue
+            for row_id, email, subscribed in rows:
+                row_ids[email] = row_id
+                yield templates[subscribed].render(email)
+            await flush_results()
+
+    try:
+        return await deliver(messages(), limits, on_result=on_result)
+    finally:
+        await flush_results()
+        await release_rows(list(row_ids.values()))
+
+
+async def send_campaign(key: str, sub_subject: str, sub_body: str, non_sub_subject: str, non_sub_body: str) -> DeliveryReport:
+    """
+    Records the campaign and sends it, delivering the first recipients while the rest are
+    still being enqueued. Safe to call again with the same emails: only the emails still pending
+    are sent. Raises CampaignConflict for a key already used with other emails.
+    """
+    campaign_id = await create_campaign(key, sub_subject, sub_body, non_sub_subject, non_sub_body)
+    enqueuing = asyncio.create_task(enqueue_recipients(campaign_id))
+    try:
+        report = await drain_campaign(campaign_id, enqueuing)
+    finally:
+        if not enqueuing.done():
+            enqueuing.cancel()
+        await asyncio.gather(enqueuing, return_exceptions=True)
+    # enqueue errors would otherwise go unnoticed
+    await enqueuing
+    return report
+
+
+async def drain_pending_campaigns() -> list[DeliveryReport]:
+    """
+    Drains every campaign that still has emails to send.
+    """
+    async with get_pg_async_session() as session:
+        result = await session.execute(
+            select(EmailOutbox.campaign_id).where(EmailOutbox.status.in_(["pending", "sending"])).distinct()
+        )
+        campaign_ids = result.scalars().all()
+    return [await drain_campaign(campaign_id) for campaign_id in campaign_ids]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send the emails still pending in the outbox.")
+    parser.add_argument("--campaign-id", type=int, help="only this campaign")
+    args = parser.parse_args()
+    if args.campaign_id is not None:
+        asyncio.run(drain_campaign(args.campaign_id))
+    else:
+        asyncio.run(drain_pending_campaigns())
@@ -0,0 +1,103 @@
+"""
+packing.py
+
+Fits scraped articles into a token budget before they are put into the writer prompt.
+Boilerplate sentences are dropped, each article keeps its lead sentences, and the budget is
+shared fairly: short articles keep all their text and the rest is split among the long ones.
+"""
+
+import math
+import re
+
+# rough average for English text with the tokenizers used through OpenRouter
+CHARS_PER_TOKEN = 4
+
+# tokens taken by the <trending_news> wrapper and the "Title:"/"Content:" labels
+ARTICLE_OVERHEAD_TOKENS = 12
+
+BOILERPLATE_PATTERN = re.compile(
+    r"^(advertisement|advertisements|sponsored|skip to (main )?content)\b"
+    r"|\b(subscribe (now|today|to our)|sign up for|newsletter sign[- ]?up|read more|click here|"
+    r"all rights reserved|cookie(s)? (policy|settings)|accept (all )?cookies|share this (article|story)|"
+    r"follow us on|download (our|the) app|log in to|create an account|terms of (use|service)|privacy policy)\b",
+    re.IGNORECASE,
+)
+# longer sentences matching the pattern are most likely real content
+BOILERPLATE_MAX_WORDS = 20
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+(?=[\"'“‘(\[]?[A-Z0-9])")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate, good enough for budgeting.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def split_sentences(text: str) -> list[str]:
+    return [sentence for sentence in SENTENCE_PATTERN.split(" ".join(text.split())) if sentence]
+
+
+def trim_boilerplate(text: str) -> str:
+    """
+    Drops navigation, subscription and legal sentences that survive HTML extraction.
+    """
+    return " ".join(
+        sentence for sentence in split_sentences(text)
+        if len(sentence.split()) > BOILERPLATE_MAX_WORDS or not BOILERPLATE_PATTERN.search(sentence)
+    )
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Keeps the lead sentences of text that fit in max_tokens. A first sentence longer than
+    the budget is cut at a word boundary.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    kept = []
+    used = 0
+    for sentence in split_sentences(text):
+        cost = estimate_tokens(sentence + " ")
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+    if kept:
+        return " ".join(kept)
+    return text[:max_tokens * CHARS_PER_TOKEN].rsplit(" ", 1)[0]
+
+
+def allocate_budget(demands: list[int], budget: int) -> list[int]:
+    """
+    Max-min fair split of budget: demands below the fair share are met in full and
+    what they leave is shared among the larger ones.
+    """
+    allocation = [0] * len(demands)
+    remaining = budget
+    pending = sorted(range(len(demands)), key=lambda i: demands[i])
+    while pending:
+        share = remaining // len(pending)
+        index = pending[0]
+        if demands[index] <= share:
+            allocation[index] = demands[index]
+            remaining -= demands[index]
+            pending.pop(0)
+        else:
+            for index in pending:
+                allocation[index] = share
+            break
+    return allocation
+
+
+def pack_articles(articles: list[dict], budget: int) -> list[dict]:
+    """
+    Returns copies of the articles whose content fits, all together, in budget tokens.
+    """
+    contents = [trim_boilerplate(article["content"]) for article in articles]
+    overhead = sum(estimate_tokens(article["title"]) + ARTICLE_OVERHEAD_TOKENS for article in articles)
+    allocation = allocate_budget([estimate_tokens(content) for content in contents], max(0, budget - overhead))
+    return [
+        {**article, "content": truncate_to_tokens(content, tokens)}
+        for article, content, tokens in zip(articles, contents, allocation)
+    ]
@@ -0,0 +1,86 @@
+"""
+ranking.py
+
+Scores webz posts from their metadata so that only the best ones get fetched and written about.
+The score is a weighted sum of features normalized to [0, 1], computed for all posts at once.
+"""
+
+from datetime import datetime, timezone
+import numpy as np
+
+FEATURES = ("performance_score", "social", "recency", "domain_rank", "top_news")
+
+# webz performance_score goes from 0 to 10
+MAX_PERFORMANCE_SCORE = 10
+RECENCY_HALF_LIFE_HOURS = 12
+
+
+def social_engagement(post: dict) -> int:
+    """
+    Total likes, comments and shares across the social networks webz reports.
+    """
+    social = post.get("thread", {}).get("social") or {}
+    return sum(
+        count for network in social.values() if isinstance(network, dict)
+        for count in network.values() if isinstance(count, (int, float))
+    )
+
+
+def _published_timestamp(post: dict) -> float:
+    published = post.get("published") or post.get("thread", {}).get("published")
+    try:
+        return datetime.fromisoformat(published).timestamp()
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def post_features(posts: list[dict], country_code: str | None = None, now: datetime | None = None) -> np.ndarray:
+    """
+    Feature matrix of shape (len(posts), len(FEATURES)), each column in [0, 1].
+    """
+    now = now or datetime.now(timezone.utc)
+    threads = [post.get("thread", {}) for post in posts]
+    performance = np.array([thread.get("performance_score") or 0 for thread in threads], dtype=float)
+    social = np.log1p(np.array([social_engagement(post) for post in posts], dtype=float))
+    published = np.array([_published_timestamp(post) for post in posts], dtype=float)
+    domain_rank = np.array([thread.get("domain_rank") or np.nan for thread in threads], dtype=float)
+    top_news = np.array([f"top_news_{country_code}" in (thread.get("site_categories") or []) for thread in threads], dtype=float)
+
+    age_hours = np.clip((now.timestamp() - published) / 3600, 0, None)
+    recency = np.nan_to_num(0.5 ** (age_hours / RECENCY_HALF_LIFE_HOURS))
+    # domain_rank is a popularity rank, 1 being the most visited site
+    log_rank = np.log1p(domain_rank)
+    max_log_rank = np.nanmax(log_rank) if np.isfinite(log_rank).any() else 0
+    domain = np.nan_to_num(1 - log_rank / max_log_rank) if max_log_rank > 0 else np.zeros(len(posts))
+    social_max = social.max() if len(posts) else 0
+
+    return np.column_stack([
+        np.clip(performance / MAX_PERFORMANCE_SCORE, 0, 1),
+        social / social_max if social_max > 0 else np.zeros(len(posts)),
+        recency,
+        domain,
+        top_news,
+    ])
+
+
+def score_posts(posts: list[dict], weights: dict[str, float], country_code: str | None = None, now: datetime | None = None) -> np.ndarray:
+    """
+    Weighted sum of the post features. Unknown weight names raise ValueError.
+    """
+    unknown = set(weights) - set(FEATURES)
+    if unknown:
+        raise ValueError(f"Unknown ranking features {sorted(unknown)}, expected some of {FEATURES}")
+    if not posts:
+        return np.zeros(0)
+    weight_vector = np.array([weights.get(feature, 0.0) for feature in FEATURES])
+    return post_features(posts, country_code, now) @ weight_vector
+
+
+def rank_posts(posts: list[dict], weights: dict[str, float], country_code: str | None = None, top_k: int | None = None, now: datetime | None = None) -> list[dict]:
+    """
+    Returns the top_k posts (all by default) by descending score, each with its "score" added.
+    Ties keep the News API order.
+    """
+    scores = score_posts(posts, weights, country_code, now)
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    return [{**posts[i], "score": float(scores[i])} for i in order]
@@ -0,0 +1,136 @@
+"""
+resilience.py
+
+Retries and hedging for flaky model providers. Every call of a node gets a deadline, rate limits,
+server errors and stalls are retried with exponential backoff and full jitter, and a slow call can
+be raced against the next model of the route once it exceeds a latency threshold.
+"""
+
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, TypeVar
+import httpx
+import openai
+from pydantic import BaseModel
+from backend.settings import settings
+
+T = TypeVar("T")
+
+# request timeout, conflict, rate limit, then any server error
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+class LLMPolicy(BaseModel):
+    """Resilience policy of the LLM calls of one graph node."""
+    deadline: float
+    max_attempts: int
+    backoff_base: float
+    backoff_max: float
+    hedge_after: float | None = None
+
+
+def get_llm_policy(node: str | None = None) -> LLMPolicy:
+    """
+    LLM_POLICY with the overrides LLM_NODE_POLICIES has for node.
+    """
+    return LLMPolicy(**{**settings.LLM_POLICY, **settings.LLM_NODE_POLICIES.get(node, {})})
+
+
+def is_retryable(error: BaseException, has_fallback: bool = False) -> bool:
+    """
+    Whether trying the same call again may work: 429 and 5xx, and stalls or connection errors
+    unless has_fallback, since a host that is down usually stays down for a while and the next
+    model of the route is a better bet than waiting on backoff.
+    """
+    if isinstance(error, (asyncio.TimeoutError, openai.APIConnectionError, httpx.TransportError)):
+        return not has_fallback
+    status_code = getattr(error, "status_code", None)
+    return isinstance(status_code, int) and (status_code in RETRYABLE_STATUS_CODES or status_code >= 500)
+
+
+def retry_after(error: BaseException) -> float | None:
+    """
+    Seconds the provider asked to wait in its Retry-After header, if any.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, policy: LLMPolicy) -> float:
+    """
+    Full jitter: uniform between 0 and the exponential backoff of this attempt (starting at 1).
+    """
+    return random.uniform(0, min(policy.backoff_max, policy.backoff_base * 2 ** (attempt - 1)))
+
+
+async def aretry(call: Callable[[float], Awaitable[T]], policy: LLMPolicy, deadline_at: float, has_fallback: bool = False) -> T:
+    """
+    Awaits call(timeout) until it succeeds, retrying retryable errors up to max_attempts times.
+    Each attempt's timeout and the waits between attempts stay within deadline_at (monotonic).
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return await call(min(settings.LLM_TIMEOUT, max(0.0, deadline_at - time.monotonic())))
+        except Exception as e:
+            if attempt >= policy.max_attempts or not is_retryable(e, has_fallback):
+                raise
+            delay = max(backoff_delay(attempt, policy), retry_after(e) or 0.0)
+            if time.monotonic() + delay >= deadline_at:
+                raise
+            print(f"LLM call failed ({e!r}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def acall_with_policy(calls: list[Callable[[float], Awaitable[T]]], policy: LLMPolicy) -> T:
+    """
+    Runs calls[0] with retries. The next call starts once the previous one failed for good, at
+    the first stall or connection error, or, with hedge_after, once it has been running that
+    long; the first result wins and the calls still running are cancelled. Raises the last error
+    if every call failed, or TimeoutError when the deadline passes first.
+    """
+    deadline_at = time.monotonic() + policy.deadline
+    pending: set[asyncio.Task] = set()
+    launched = 0
+    last_launch = 0.0
+    last_error: BaseException | None = None
+
+    def launch():
+        nonlocal launched, last_launch
+        pending.add(asyncio.create_task(aretry(calls[launched], policy, deadline_at, has_fallback=launched < len(calls) - 1)))
+        launched += 1
+        last_launch = time.monotonic()
+
+    launch()
+    try:
+        while pending:
+            wake_at = deadline_at
+            can_hedge = policy.hedge_after is not None and launched < len(calls)
+            if can_hedge:
+                wake_at = min(wake_at, last_launch + policy.hedge_after)
+            done, _ = await asyncio.wait(pending, timeout=max(0.0, wake_at - time.monotonic()), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if time.monotonic() >= deadline_at:
+                    raise TimeoutError(f"LLM call exceeded its {policy.deadline}s deadline")
+                if can_hedge:
+                    launch()
+                continue
+            pending -= done
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+            last_error = next(task.exception() for task in done)
+            if not pending and launched < len(calls):
+                print(f"LLM call failed ({last_error!r}), falling back")
+                launch()
+        raise last_error
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
@@ -1,12 +1,90 @@
-from backend.graph import build_curation_agent
+from backend.graph import build_curation_agent, newsletter_thread_id
+from backend.checkpoint import get_checkpointer
+from backend.scraping import get_scraping_client
+from backend.llm import aclose_chat_models
+from backend.settings import settings
+from pydantic import BaseModel
+import argparse
 import asyncio
+import time
+
+
+class CountryRunResult(BaseModel):
+    """
+    Outcome of the curation graph for one country.
+    """
+    country: str
+    ok: bool
+    elapsed_seconds: float
+    newsletter_title: str | None = None
+    articles: int = 0
+    error: str | None = None
+
 
 async def run_newsletter_agent():
     """
     Run the newsletter generation agent
     """
     newsletter_agent_graph = build_curation_agent()
-    await newsletter_agent_graph.ainvoke({})
+    try:
+        await newsletter_agent_graph.ainvoke({})
+    finally:
+        await get_scraping_client().aclose()
+        get_scraping_client().close()
+        await aclose_chat_models()
+
+async def run_country(newsletter_agent_graph, country: str, semaphore: asyncio.Semaphore, resume: bool = False) -> CountryRunResult:
+    """
+    Runs the graph for one country, turning failures into a result instead of an exception.
+    With resume and a checkpointed graph, an unfinished run of the day continues from its last
+    completed node, and a finished one is not run again.
+    """
+    config = {"configurable": {"thread_id": newsletter_thread_id(country)}}
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            snapshot = None
+            if resume and newsletter_agent_graph.checkpointer:
+                snapshot = await newsletter_agent_graph.aget_state(config)
+            if snapshot is not None and snapshot.values:
+                final_state = await newsletter_agent_graph.ainvoke(None, config) if snapshot.next else snapshot.values
+            else:
+                final_state = await newsletter_agent_graph.ainvoke({"country": country}, config)
+        except Exception as e:
+            return CountryRunResult(country=country, ok=False, elapsed_seconds=time.perf_counter() - start, error=repr(e))
+        trending_news = final_state.get("trending_news")
+        return CountryRunResult(
+            country=country,
+            ok=True,
+            elapsed_seconds=time.perf_counter() - start,
+            newsletter_title=final_state.get("newsletter_title"),
+            articles=len(trending_news) if isinstance(trending_news, list) else 0,
+        )
+
+async def run_newsletter_agent_for_countries(countries: list[str], max_parallel: int, resume: bool = False) -> list[CountryRunResult]:
+    """
+    Runs the newsletter generation agent for several countries concurrently, at most
+    max_parallel at a time. All runs share the process-wide HTTP pools and caches.
+    """
+    newsletter_agent_graph = build_curation_agent(get_checkpointer())
+    semaphore = asyncio.Semaphore(max_parallel)
+    try:
+        results = await asyncio.gather(*(run_country(newsletter_agent_graph, country, semaphore, resume) for country in countries))
+    finally:
+        await get_scraping_client().aclose()
+        get_scraping_client().close()
+        await aclose_chat_models()
+    for result in results:
+        status = "ok" if result.ok else f"failed: {result.error}"
+        print(f"[{result.country}] {status} in {result.elapsed_seconds:.1f}s, {result.articles} articles, title: {result.newsletter_title}")
+    return results
 
 if __name__ == "__main__":
-    asyncio.run(run_newsletter_agent())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the daily newsletter agent.")
+    parser.add_argument("--countries", nargs="+", default=settings.NEWSLETTER_COUNTRIES)
+    parser.add_argument("--max-parallel", type=int, default=settings.NEWSLETTER_MAX_PARALLEL_COUNTRIES)
+    parser.add_argument("--resume", action="store_true", help="continue today's failed runs from their last completed node")
+    args = parser.parse_args()
+    results = asyncio.run(run_newsletter_agent_for_countries(args.countries, args.max_parallel, args.resume))
+    if not all(result.ok for result in results):
+        raise SystemExit(1)
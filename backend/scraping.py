@@ -0,0 +1,215 @@
+"""
+scraping.py
+
+HTTP client layer used to scrape news articles: keep-alive connection pools keyed by host,
+a per-domain token bucket and a global cap on in-flight requests.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from backend.settings import settings
+
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid", "ref", "ref_src", "cmpid", "ocid"}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalizes a URL so that variants of the same page share one cache key:
+    lowercases scheme and host, drops default ports, fragments and tracking parameters,
+    and sorts the query string.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+AMP_PARAMS = {"amp", "outputtype", "output"}
+
+
+def canonical_url(url: str) -> str:
+    """
+    Identity of the page behind a URL, used to spot the same article linked several ways.
+    On top of normalize_url it ignores the scheme, "www."/"amp." host prefixes, AMP paths
+    and parameters, and trailing slashes. Not meant to be fetched.
+    """
+    parts = urlsplit(normalize_url(url))
+    host = parts.netloc
+    for prefix in ("www.", "amp.", "m."):
+        host = host.removeprefix(prefix)
+    segments = [segment for segment in parts.path.split("/") if segment and segment.lower() not in ("amp", "amp.html")]
+    path = "/".join(segments).removesuffix(".amp").removesuffix(".amp.html")
+    query = urlencode([
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not (key.lower() in AMP_PARAMS and value.lower() in ("", "1", "true", "amp"))
+    ])
+    return f"{host}/{path}" + (f"?{query}" if query else "")
+
+
+class TokenBucket:
+    """
+    Token bucket that refills `rate` tokens per second up to `capacity`.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Takes one token and returns how many seconds the caller has to wait before using it.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        time.sleep(self.reserve())
+
+    async def aacquire(self):
+        await asyncio.sleep(self.reserve())
+
+
+class _LoopState:
+    """
+    Async resources of one event loop; httpx clients and asyncio primitives can't be shared across loops.
+    """
+    def __init__(self, max_in_flight: int):
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.clients: dict[str, httpx.AsyncClient] = {}
+
+
+class ScrapingClient:
+    """
+    Rate limited HTTP client for article scraping with both sync and async interfaces.
+    """
+    def __init__(
+        self,
+        rate_per_domain: float,
+        burst_per_domain: int,
+        max_in_flight: int,
+        pool_size_per_host: int,
+        timeout: float,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.rate_per_domain = rate_per_domain
+        self.burst_per_domain = burst_per_domain
+        self.max_in_flight = max_in_flight
+        self.pool_size_per_host = pool_size_per_host
+        self.timeout = timeout
+        self.transport = transport
+        self._buckets: dict[str, TokenBucket] = {}
+        self._buckets_lock = threading.Lock()
+        self._sessions: dict[str, requests.Session] = {}
+        self._sessions_lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+
+    def _bucket(self, host: str) -> TokenBucket:
+        with self._buckets_lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rate_per_domain, self.burst_per_domain)
+                self._buckets[host] = bucket
+            return bucket
+
+    def _session(self, host: str) -> requests.Session:
+        with self._sessions_lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size_per_host)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[host] = session
+            return session
+
+    def _loop_state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            state = _LoopState(self.max_in_flight)
+            self._loops[loop] = state
+        return state
+
+    def _async_client(self, host: str) -> httpx.AsyncClient:
+        clients = self._loop_state().clients
+        client = clients.get(host)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                transport=self.transport,
+                limits=httpx.Limits(max_connections=self.pool_size_per_host, max_keepalive_connections=self.pool_size_per_host),
+            )
+            clients[host] = client
+        return client
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a GET request through the keep-alive session of the URL's host.
+        """
+        host = urlsplit(url).netloc.lower()
+        self._bucket(host).acquire()
+        with self._in_flight:
+            return self._session(host).get(url, timeout=self.timeout, **kwargs)
+
+    async def aget(self, url: str, **kwargs) -> httpx.Response:
+        """
+        Async version of get. The whole request, body included, is bounded by the client timeout.
+        """
+        host = urlsplit(url).netloc.lower()
+        await self._bucket(host).aacquire()
+        async with self._loop_state().semaphore:
+            return await asyncio.wait_for(self._async_client(host).get(url, **kwargs), timeout=self.timeout)
+
+    def close(self):
+        with self._sessions_lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    async def aclose(self):
+        """
+        Closes the async connection pools of the running event loop.
+        """
+        state = self._loops.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await asyncio.gather(*(client.aclose() for client in state.clients.values()))
+
+
+_scraping_client: ScrapingClient | None = None
+
+def get_scraping_client() -> ScrapingClient:
+    """
+    Returns the process-wide scraping client.
+    """
+    global _scraping_client
+    if _scraping_client is None:
+        _scraping_client = ScrapingClient(
+            rate_per_domain=settings.SCRAPE_RATE_PER_DOMAIN,
+            burst_per_domain=settings.SCRAPE_BURST_PER_DOMAIN,
+            max_in_flight=settings.SCRAPE_CONCURRENCY,
+            pool_size_per_host=settings.SCRAPE_POOL_SIZE_PER_HOST,
+            timeout=settings.SCRAPE_TIMEOUT,
+        )
+    return _scraping_client
@@ -7,8 +7,45 @@ class Settings(BaseSettings):
     OLLAMA_BASE_URL: str = "http://ollama:11434"
     LLM_MODEL_LIGHT: str = "gemma3n:e4b"
     LLM_MODEL: str = "qwen3:8b-q4_K_M"
+    LLM_MODEL_LIGHT_BASE_URL: str | None = None
+    # never the OpenRouter key, which must not be sent to another host; Ollama ignores it
+    LLM_MODEL_LIGHT_API_KEY: str = "ollama"
+    # model tiers tried in order for each graph node, see llm.get_route_models. Heavy only by default,
+    # since the light tier needs a running Ollama: opt in per node, e.g. {"summarize_articles": ["light", "heavy"]}
+    LLM_ROUTES: dict[str, list[str]] = {
+        "summarize_articles": ["heavy"],
+        "generate_newsletter": ["heavy"],
+        "fix_json": ["heavy"],
+        "generate_email_for_sub": ["heavy"],
+        "generate_email_for_non_sub": ["heavy"],
+    }
     OPENROUTER_API_KEY: str
     OPENROUTER_MODEL: str = "qwen/qwen3-235b-a22b:free"
+    OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_TIMEOUT: float = 180.0
+    # retries, deadline and hedging of the LLM calls of a node, see resilience.LLMPolicy
+    LLM_POLICY: dict[str, float | int | None] = {
+        "deadline": 600.0,
+        "max_attempts": 4,
+        "backoff_base": 2.0,
+        "backoff_max": 60.0,
+        "hedge_after": None,
+    }
+    LLM_NODE_POLICIES: dict[str, dict[str, float | int | None]] = {
+        "generate_email_for_sub": {"deadline": 300.0, "hedge_after": 45.0},
+        "generate_email_for_non_sub": {"deadline": 300.0, "hedge_after": 45.0},
+    }
+    LLM_STRUCTURED_OUTPUT: str = "none"
+    LLM_STREAMING: bool = True
+    LLM_STREAM_ABORT_CHARS: int = 2000
+    LLM_STREAM_PROGRESS_EVERY: int = 50
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = ".cache/llm.sqlite3"
+    LLM_CACHE_TTL: float = 2 * 24 * 3600
+    LLM_CACHE_MEMORY_ENTRIES: int = 256
+    LLM_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    GRAPH_CHECKPOINTS_ENABLED: bool = True
     STRIPE_SECRET_KEY: str
     STRIPE_SUBSCRIPTION_PRICE_KEY: str
     STRIPE_WEBHOOK_SECRET: str
@@ -21,7 +58,55 @@ class Settings(BaseSettings):
     JWT_SECRET_KEY: str
     EMAIL_ADDRESS:str
     EMAIL_PASSWORD:str
+    # e.g. "https://example.com/unsubscribe?email={email}", adds a List-Unsubscribe header to campaigns
+    EMAIL_UNSUBSCRIBE_URL: str | None = None
+    SMTP_HOST: str = "smtp.gmail.com"
+    SMTP_PORT: int = 465
+    SMTP_TIMEOUT: float = 30.0
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = 100
+    # None means the limits of the provider in SMTP_PROVIDER_LIMITS, see mailer.provider_limits
+    SMTP_CONCURRENCY: int | None = None
+    SMTP_RATE_PER_SECOND: float | None = None
+    SMTP_PROVIDER_LIMITS: dict[str, dict[str, float]] = {
+        "smtp.gmail.com": {"concurrency": 3, "rate_per_second": 1.0},
+        "amazonaws.com": {"concurrency": 10, "rate_per_second": 14.0},
+        "smtp.sendgrid.net": {"concurrency": 10, "rate_per_second": 50.0},
+        "smtp.mailgun.org": {"concurrency": 10, "rate_per_second": 50.0},
+        "default": {"concurrency": 4, "rate_per_second": 5.0},
+    }
+    SMTP_REPORT_EVERY: int = 500
+    # upper bound, claims are capped to what the SMTP rate sends within half a lease, see outbox.claim_size
+    OUTBOX_BATCH_SIZE: int = 1000
+    OUTBOX_LEASE_SECONDS: float = 600.0
+    OUTBOX_POLL_SECONDS: float = 0.5
+    # rows that hit a transient SMTP error are retried this long after their last claim,
+    # and marked failed once they were claimed OUTBOX_MAX_ATTEMPTS times
+    OUTBOX_RETRY_SECONDS: float = 300.0
+    OUTBOX_MAX_ATTEMPTS: int = 5
     DEPLOY_LOCATION:str = "remote"
+    ADMIN_EMAILS: list[str] = []
+    SCRAPE_CONCURRENCY: int = 8
+    SCRAPE_TIMEOUT: float = 10.0
+    SCRAPE_RATE_PER_DOMAIN: float = 2.0
+    SCRAPE_BURST_PER_DOMAIN: int = 4
+    SCRAPE_POOL_SIZE_PER_HOST: int = 4
+    HTML_EXTRACTOR: str = "stream"
+    DEDUP_THRESHOLD: float = 0.6
+    FETCH_HEADROOM: int = 2
+    RANKING_WEIGHTS: dict[str, float] = {"performance_score": 1.0, "social": 0.5, "recency": 0.5, "domain_rank": 0.25, "top_news": 0.25}
+    NEWSLETTER_ARTICLE_COUNT: int = 3
+    NEWSLETTER_COUNTRIES: list[str] = ["US"]
+    NEWSLETTER_MAX_PARALLEL_COUNTRIES: int = 3
+    NEWSLETTER_CONTEXT_TOKENS: int = 6000
+    NEWSLETTER_CURATION_MODE: str = "single"
+    NEWSLETTER_SUMMARY_TOKENS: int = 250
+    NEWSLETTER_SUMMARY_INPUT_TOKENS: int = 3000
+    NEWSLETTER_SUMMARY_CONCURRENCY: int = 8
+    ARTICLE_CACHE_ENABLED: bool = True
+    ARTICLE_CACHE_PATH: str = ".cache/articles.sqlite3"
+    ARTICLE_CACHE_TTL: float = 3 * 24 * 3600
+    ARTICLE_CACHE_REVALIDATE_AFTER: float = 3600
+    ARTICLE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
 
     @property
     def DATABASE_URL(self) -> str:
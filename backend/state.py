@@ -5,14 +5,15 @@ Defines states shared between agents as well as the input and output types for t
 """
 
 from pydantic import BaseModel
-from typing import Deque, List, Optional, Tuple, Dict
+from typing import Any, Deque, List, Optional, Tuple, Dict
 
 class AgentState(BaseModel):
     """Internal state shared between agents in the graph."""
     user_interests: Optional[List[str]] = None
     country: str = "US"
     agent_type: str = "curation"
-    trending_news: Optional[List[Dict[str, str]]] = None
+    trending_news: Optional[List[Dict[str, Any]]] = None
+    article_summaries: Optional[List[Dict[str, Any]]] = None
     payment_status: Optional[str] = None
     newsletter_title: Optional[str] = None
     newsletter_content: Optional[str] = None
@@ -0,0 +1,190 @@
+"""
+streaming.py
+
+Progress of a streamed LLM answer (time to first token, tokens so far, title as soon as it is
+written) reported as LangGraph custom stream events, and the server-sent events built from a
+graph run. Answers that are obviously not the expected JSON are aborted early.
+"""
+
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Callable
+from langchain_core.callbacks import AsyncCallbackHandler
+from langgraph.config import get_stream_writer
+
+
+class LLMOutputAborted(Exception):
+    """Raised while streaming when the answer is clearly not going to be usable."""
+    def __init__(self, reason: str, text: str):
+        super().__init__(reason)
+        self.text = text
+
+
+_THINK_OPEN, _THINK_CLOSE = "<think>", "</think>"
+
+
+def _partial_suffix(text: str, tag: str) -> int:
+    """Length of the longest end of text that is the start of tag, e.g. "<thi" for "<think>"."""
+    for size in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:size]):
+            return size
+    return 0
+
+
+def _stream_writer() -> Callable[[Any], None]:
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        # called outside of a graph run, e.g. a node awaited directly
+        return lambda event: None
+
+
+class _FieldWatcher:
+    """
+    Finds the string value of one JSON field in text that only grows, without rescanning what
+    was already ruled out: first the key, then the unescaped quote closing the value.
+    """
+    def __init__(self, field: str):
+        self.key = f'"{field}"'
+        self.key_pattern = re.compile(rf'{re.escape(self.key)}\s*:\s*"')
+        self.incomplete_key_pattern = re.compile(rf'{re.escape(self.key)}\s*(:\s*)?')
+        self.key_from = 0
+        self.value_start: int | None = None
+        self.scan_from = 0
+
+    def feed(self, text: str) -> str | None:
+        """The value once its closing quote has been written, None until then."""
+        while self.value_start is None:
+            position = text.find(self.key, self.key_from)
+            if position == -1:
+                self.key_from = max(self.key_from, len(text) - len(self.key) + 1)
+                return None
+            if match := self.key_pattern.match(text, position):
+                self.value_start = self.scan_from = match.end()
+            elif self.incomplete_key_pattern.fullmatch(text, position):
+                # the rest of the key may still be coming
+                self.key_from = position
+                return None
+            else:
+                self.key_from = position + 1
+        while (end := text.find('"', self.scan_from)) != -1:
+            backslashes = 0
+            while end - backslashes - 1 >= self.value_start and text[end - backslashes - 1] == "\\":
+                backslashes += 1
+            if backslashes % 2 == 0:
+                return text[self.value_start:end]
+            self.scan_from = end + 1
+        self.scan_from = len(text)
+        return None
+
+
+class StreamProgress(AsyncCallbackHandler):
+    """
+    Callback handler watching the tokens of one streamed answer of `node`. Emits "first_token",
+    "progress" every `progress_every` tokens and "field" once a string field of `fields` is
+    complete. Raises LLMOutputAborted if `abort_after_chars` characters were written outside
+    of <think> blocks without the start of a JSON object. Each token is only looked at once,
+    so long reasoning doesn't slow the event loop down.
+    """
+    raise_error = True
+
+    def __init__(self, node: str, fields: list[str], abort_after_chars: int, progress_every: int):
+        self.node = node
+        self.abort_after_chars = abort_after_chars
+        self.progress_every = progress_every
+        self.watchers = {field: _FieldWatcher(field) for field in fields}
+        self.writer = _stream_writer()
+        self.chunks: list[str] = []
+        self.chars = 0
+        self.tokens = 0
+        self.started_at = time.perf_counter()
+        self.time_to_first_token: float | None = None
+        self.in_think = False
+        # end of the text that may be the start of a think tag
+        self.pending = ""
+        self.visible_chars = 0
+        # visible text from the start of the JSON object on
+        self.json_text: str | None = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def emit(self, event: str, **data: Any):
+        self.writer({"event": event, "node": self.node, **data})
+
+    def _visible(self, token: str) -> str:
+        """The part of token outside of <think> blocks, tags split across tokens included."""
+        text, visible = self.pending + token, []
+        while True:
+            tag = _THINK_CLOSE if self.in_think else _THINK_OPEN
+            position = text.find(tag)
+            if position != -1:
+                if not self.in_think:
+                    visible.append(text[:position])
+                self.in_think = not self.in_think
+                text = text[position + len(tag):]
+                continue
+            keep = _partial_suffix(text, tag)
+            if not self.in_think:
+                visible.append(text[:len(text) - keep])
+            self.pending = text[len(text) - keep:]
+            return "".join(visible)
+
+    async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if not token:
+            return
+        self.tokens += 1
+        self.chunks.append(token)
+        self.chars += len(token)
+        if self.time_to_first_token is None:
+            self.time_to_first_token = time.perf_counter() - self.started_at
+            self.emit("first_token", seconds=round(self.time_to_first_token, 3))
+        if self.tokens % self.progress_every == 0:
+            self.emit("progress", tokens=self.tokens, chars=self.chars, seconds=round(time.perf_counter() - self.started_at, 3))
+        visible = self._visible(token)
+        if self.json_text is None:
+            start = visible.find("{")
+            if start == -1:
+                self.visible_chars += len(visible)
+                if self.visible_chars >= self.abort_after_chars:
+                    raise LLMOutputAborted(f"no JSON object in the first {self.visible_chars} characters", self.text)
+                return
+            self.json_text = visible[start:]
+        else:
+            self.json_text += visible
+        for field, watcher in list(self.watchers.items()):
+            if (value := watcher.feed(self.json_text)) is not None:
+                del self.watchers[field]
+                self.emit("field", field=field, value=value)
+
+
+def format_sse(event: str, data: Any) -> str:
+    """
+    Formats one server-sent event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def astream_run_events(graph, graph_input: Any, config: dict) -> AsyncIterator[tuple[str, dict]]:
+    """
+    Runs graph and yields (event, data) pairs: the custom progress events of the nodes,
+    "node_completed" after each node, "interrupted" if the run stopped at an interrupt, then
+    "done" or "error".
+    """
+    started_at = time.perf_counter()
+    try:
+        async for mode, chunk in graph.astream(graph_input, config, stream_mode=["updates", "custom"]):
+            if mode == "custom":
+                yield chunk.get("event", "custom"), chunk
+            else:
+                for node in chunk:
+                    if node == "__interrupt__":
+                        yield "interrupted", {"seconds": round(time.perf_counter() - started_at, 3)}
+                    else:
+                        yield "node_completed", {"node": node, "seconds": round(time.perf_counter() - started_at, 3)}
+    except Exception as e:
+        yield "error", {"error": repr(e), "seconds": round(time.perf_counter() - started_at, 3)}
+        return
+    yield "done", {"seconds": round(time.perf_counter() - started_at, 3)}
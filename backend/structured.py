@@ -0,0 +1,214 @@
+"""
+structured.py
+
+JSON outputs of the LLM nodes: output schemas, provider side structured output, and a tolerant
+local parser that repairs the usual mistakes (code fences, <think> blocks, trailing commas,
+raw newlines and unescaped quotes inside strings) without another model call.
+"""
+
+import json
+import re
+from typing import TypeVar
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables.config import ensure_config, merge_configs
+from pydantic import BaseModel, Field, ValidationError
+from backend.llm import ainvoke_chat, evict_cached, recording_cache_keys
+from backend.resilience import LLMPolicy, acall_with_policy, get_llm_policy
+from backend.streaming import LLMOutputAborted, StreamProgress
+from backend.settings import settings
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class UnparseableOutput(Exception):
+    """Raised to hand over to the next model when an answer doesn't match the schema."""
+    def __init__(self, raw_content: str):
+        super().__init__("answer does not match the schema")
+        self.raw_content = raw_content
+
+
+class NewsletterOutput(BaseModel):
+    """Newsletter written by generate_newsletter."""
+    Title: str = Field(description="Creative title of the newsletter")
+    Content: str = Field(description="Body of the newsletter")
+
+
+class EmailOutput(BaseModel):
+    """Marketing email written by the email nodes."""
+    Subject: str = Field(description="Email subject")
+    HTML: str = Field(description="Email body in HTML")
+
+
+_THINK_PATTERN = re.compile(r"<think>.*?</think>", re.DOTALL)
+_FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+
+
+def strip_think(text: str) -> str:
+    """
+    Removes the <think> blocks of reasoning models from an answer.
+    """
+    return _THINK_PATTERN.sub("", text).strip()
+
+
+def _json_candidate(text: str) -> str:
+    """
+    Cuts the outermost {...} out of a model answer.
+    """
+    text = strip_think(text)
+    fenced = _FENCE_PATTERN.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1:
+        return text.strip()
+    return text[start:end + 1] if end > start else text[start:] + "}"
+
+
+def _escape_control_characters(candidate: str) -> str:
+    """
+    Escapes raw newlines and tabs that appear inside JSON strings.
+    """
+    out = []
+    in_string = False
+    escaped = False
+    for char in candidate:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            elif char == "\n":
+                char = "\\n"
+            elif char == "\r":
+                char = "\\r"
+            elif char == "\t":
+                char = "\\t"
+        elif char == '"':
+            in_string = True
+        out.append(char)
+    return "".join(out)
+
+
+def _decode_string(raw: str) -> str:
+    try:
+        return json.loads(f'"{_escape_control_characters(raw)}"')
+    except json.JSONDecodeError:
+        return raw.replace('\\"', '"').replace("\\n", "\n")
+
+
+def _extract_fields(candidate: str, keys: list[str]) -> dict | None:
+    """
+    Last resort for strings with unescaped quotes (typically HTML attributes): every value is
+    taken as the text between its key and the next known key, or the closing brace.
+    """
+    positions = []
+    for key in keys:
+        match = re.search(rf'"{re.escape(key)}"\s*:\s*"', candidate)
+        if match is None:
+            return None
+        positions.append((match.start(), match.end(), key))
+    positions.sort()
+    values = {}
+    for index, (_, value_start, key) in enumerate(positions):
+        value_end = positions[index + 1][0] if index + 1 < len(positions) else len(candidate)
+        raw = candidate[value_start:value_end].rstrip()
+        raw = raw.removesuffix("}").rstrip().removesuffix(",").rstrip()
+        values[key] = _decode_string(raw.removesuffix('"'))
+    return values
+
+
+def repair_json(text: str, keys: list[str] | None = None) -> dict | None:
+    """
+    Parses a JSON object out of text, repairing it locally if needed. With keys, values can still
+    be recovered when quotes inside them were not escaped. Returns None if nothing works.
+    """
+    candidate = _json_candidate(text)
+    attempts = (
+        candidate,
+        _TRAILING_COMMA_PATTERN.sub(r"\1", candidate),
+        _escape_control_characters(_TRAILING_COMMA_PATTERN.sub(r"\1", candidate)),
+    )
+    for attempt in attempts:
+        try:
+            parsed = json.loads(attempt)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(parsed, dict):
+            return parsed
+    if keys:
+        return _extract_fields(candidate, keys)
+    return None
+
+
+def parse_structured(text: str, schema: type[T]) -> T | None:
+    """
+    Parses and validates a model answer against schema, or returns None.
+    """
+    parsed = repair_json(text, list(schema.model_fields))
+    if parsed is None:
+        return None
+    try:
+        return schema.model_validate(parsed)
+    except ValidationError:
+        return None
+
+
+async def _astream_structured(chat_model: BaseChatModel, messages: list[BaseMessage], schema: type[T], node: str, timeout: float | None) -> tuple[T | None, str]:
+    progress = StreamProgress(node, list(schema.model_fields), settings.LLM_STREAM_ABORT_CHARS, settings.LLM_STREAM_PROGRESS_EVERY)
+    # merged into the graph's config so that its own callbacks (tracing, stream modes) keep working
+    config = merge_configs(ensure_config(), {"callbacks": [progress]})
+    try:
+        result = await ainvoke_chat(chat_model, messages, timeout, config=config, stream=True)
+    except LLMOutputAborted as e:
+        progress.emit("aborted", reason=str(e), tokens=progress.tokens)
+        return None, e.text
+    progress.emit("completed", tokens=progress.tokens, seconds_to_first_token=progress.time_to_first_token)
+    return parse_structured(result.content, schema), result.content
+
+
+async def ainvoke_structured(chat_model: BaseChatModel, messages: list[BaseMessage], schema: type[T], stream_node: str | None = None, timeout: float | None = None) -> tuple[T | None, str]:
+    """
+    Asks for an answer matching schema and returns it with the raw answer text.
+    LLM_STRUCTURED_OUTPUT picks how the provider is asked: "json_schema", "json_mode" or "none"
+    (prompt only). Whatever the provider returns, invalid JSON goes through the local repair parser.
+    With stream_node and LLM_STREAMING on, a prompt only answer is streamed and reported as
+    progress events of that node, and given up early if it is clearly not JSON.
+    """
+    method = settings.LLM_STRUCTURED_OUTPUT
+    if method == "none" and stream_node and settings.LLM_STREAMING:
+        return await _astream_structured(chat_model, messages, schema, stream_node, timeout)
+    if method == "none":
+        result = await ainvoke_chat(chat_model, messages, timeout)
+        return parse_structured(result.content, schema), result.content
+    structured_model = chat_model.with_structured_output(schema, method=method, include_raw=True)
+    result = await ainvoke_chat(structured_model, messages, timeout)
+    raw_content = result["raw"].content
+    if result["parsed"] is not None:
+        return result["parsed"], raw_content
+    return parse_structured(raw_content, schema), raw_content
+
+
+async def ainvoke_structured_with_fallbacks(chat_models: list[BaseChatModel], messages: list[BaseMessage], schema: type[T], stream_node: str | None = None, policy: LLMPolicy | None = None) -> tuple[T | None, str]:
+    """
+    ainvoke_structured on the models in route order under policy (LLM_POLICY by default), see
+    llm.ainvoke_with_fallbacks. An answer that can't be parsed also hands over to the next model;
+    if no model gives a valid one, the last raw answer is returned with None. Unparseable answers
+    are evicted from the LLM cache, so that a rerun asks the model again.
+    """
+    async def call(chat_model: BaseChatModel, timeout: float) -> tuple[T, str]:
+        with recording_cache_keys() as cache_keys:
+            output, raw_content = await ainvoke_structured(chat_model, messages, schema, stream_node, timeout)
+        if output is None:
+            evict_cached(cache_keys)
+            raise UnparseableOutput(raw_content)
+        return output, raw_content
+
+    calls = [lambda timeout, chat_model=chat_model: call(chat_model, timeout) for chat_model in chat_models]
+    try:
+        return await acall_with_policy(calls, policy or get_llm_policy())
+    except UnparseableOutput as e:
+        return None, e.raw_content
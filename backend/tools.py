@@ -1,71 +1,241 @@
+import asyncio
+import httpx
 import requests
-from bs4 import BeautifulSoup
 from langsmith import traceable
 from backend.settings import settings
+from backend.scraping import get_scraping_client, normalize_url, canonical_url
+from backend.cache import DiskCache, CacheEntry
+from backend.extractors import get_extractor
+from backend.dedup import dedupe
+from backend.ranking import rank_posts, social_engagement
 from backend.db import get_pg_async_session
 from backend.models.user import User
 import stripe
 from smtplib import SMTP_SSL
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+from backend.mailer import build_message
 from sqlalchemy import select
 
 
-@traceable
-def fetch_news_api(country: str):
+def country_code(country: str) -> str:
     """
-    Tool that fetches news articles from News API
+    Maps a country name to the code used by webz site categories.
     """
     match country:
         case "US":
-            country = "us"
+            return "us"
         case "Brazil":
-            country = "br"
+            return "br"
         case "Japan":
-            country = "jp"
-    url =  f"https://api.webz.io/newsApiLite?token={settings.NEWS_API_KEY}&q=published%3A%3Enow-24h%20site_category%3Atop_news_{country}%20performance_score%3A%3E0%20country%3A{country}%20language%3Aenglish"
-    
-    response = requests.get(url, timeout=10)
+            return "jp"
+    return country
+
+def news_api_url(country: str) -> str:
+    """
+    Builds the webz News API Lite query for today's top news of a country.
+    """
+    country = country_code(country)
+    return f"https://api.webz.io/newsApiLite?token={settings.NEWS_API_KEY}&q=published%3A%3Enow-24h%20site_category%3Atop_news_{country}%20performance_score%3A%3E0%20country%3A{country}%20language%3Aenglish"
+
+def news_entry(post: dict, content: str) -> dict:
+    """
+    Trending news entry: the article text along with the post metadata used for ranking.
+    """
+    thread = post.get("thread", {})
+    return {
+        "title": post["title"],
+        "content": content,
+        "url": post["url"],
+        "site": thread.get("site"),
+        "published": post.get("published"),
+        "performance_score": thread.get("performance_score"),
+        "social_engagement": social_engagement(post),
+        "score": post.get("score"),
+    }
+
+def unique_posts(posts: list[dict]) -> list[dict]:
+    """
+    Drops posts linking to an article already listed (AMP, tracking or mobile variants).
+    """
+    seen = set()
+    output = []
+    for post in posts:
+        key = canonical_url(post["url"])
+        if key not in seen:
+            seen.add(key)
+            output.append(post)
+    return output
+
+@traceable
+def fetch_news_api(country: str, limit: int | None = None):
+    """
+    Tool that fetches news articles from News API.
+    With a limit, fetching stops once limit + FETCH_HEADROOM articles were extracted.
+    """
+    try:
+        response = get_scraping_client().get(news_api_url(country))
+    except requests.RequestException as e:
+        return {"trending_news": f"Error fetching news: {e}"}
     if response.status_code == 200:
         data = response.json()
-        articles = data["posts"]
+        articles = unique_posts(data["posts"])
+        target = None if limit is None else limit + settings.FETCH_HEADROOM
         output = []
+        seen_contents = set()
         for article in articles:
-            source_url = article["url"]
-            title = article["title"]
-            content = get_text_content(source_url)
-            if content !="":
-                output.append({
-                    "title": title,
-                    "content": content,
-                    })
+            if target is not None and len(output) >= target:
+                break
+            content = get_text_content(article["url"])
+            if content !="" and (target is None or content not in seen_contents):
+                seen_contents.add(content)
+                output.append(news_entry(article, content))
         return {"trending_news": output}
     else:
         return {"trending_news": f"Error fetching news: {response.status_code}"}
-        
+
+async def fetch_articles(posts: list[dict], target: int | None = None) -> list[str]:
+    """
+    Fetches the content of posts concurrently, returning one text per post in the same order.
+    With a target, posts are fetched in order and only as many are started as are still
+    needed to reach target distinct non-empty articles; the rest are left as "".
+    """
+    if target is None:
+        return list(await asyncio.gather(*(aget_text_content(post["url"]) for post in posts)))
+    contents = [""] * len(posts)
+    seen_contents = set()
+    pending: dict[asyncio.Task, int] = {}
+    next_index = 0
+    try:
+        while len(seen_contents) < target and (pending or next_index < len(posts)):
+            while next_index < len(posts) and len(pending) < target - len(seen_contents):
+                pending[asyncio.create_task(aget_text_content(posts[next_index]["url"]))] = next_index
+                next_index += 1
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = pending.pop(task)
+                content = task.result()
+                if content != "" and content not in seen_contents and len(seen_contents) < target:
+                    seen_contents.add(content)
+                    contents[index] = content
+    finally:
+        for task in pending:
+            task.cancel()
+    return contents
+
+@traceable
+async def afetch_news_api(country: str, limit: int | None = None):
+    """
+    Async version of fetch_news_api that fetches articles concurrently.
+    Duplicate links and syndicated copies of the same story are dropped, and posts are ranked
+    with RANKING_WEIGHTS before fetching so that a limit only fetches the best ones.
+    Articles are returned best first.
+    """
+    try:
+        response = await get_scraping_client().aget(news_api_url(country))
+    except (httpx.HTTPError, asyncio.TimeoutError) as e:
+        return {"trending_news": f"Error fetching news: {e}"}
+    if response.status_code != 200:
+        return {"trending_news": f"Error fetching news: {response.status_code}"}
+    articles = rank_posts(unique_posts(response.json()["posts"]), settings.RANKING_WEIGHTS, country_code(country))
+    articles = dedupe(articles, lambda post: f"{post['title']} {post.get('text', '')}", settings.DEDUP_THRESHOLD)
+    target = None if limit is None else limit + settings.FETCH_HEADROOM
+    contents = await fetch_articles(articles, target)
+    output = []
+    for article, content in zip(articles, contents):
+        if content != "":
+            output.append(news_entry(article, content))
+    return {"trending_news": output}
+
+def extract_text(html: str) -> str:
+    """
+    Extracts readable text from HTML, preferring the <article> element.
+    The backend is chosen with the HTML_EXTRACTOR setting.
+    """
+    return get_extractor(settings.HTML_EXTRACTOR)(html)
+
+_article_cache: DiskCache | None = None
+
+def get_article_cache() -> DiskCache | None:
+    """
+    Returns the persistent cache of extracted article text, or None if it is disabled.
+    """
+    global _article_cache
+    if _article_cache is None and settings.ARTICLE_CACHE_ENABLED:
+        _article_cache = DiskCache(settings.ARTICLE_CACHE_PATH, ttl=settings.ARTICLE_CACHE_TTL, max_bytes=settings.ARTICLE_CACHE_MAX_BYTES)
+    return _article_cache
+
+def _conditional_headers(cached: CacheEntry | None) -> dict:
+    """
+    Builds revalidation headers from a cached article.
+    """
+    headers = {}
+    if cached is not None:
+        if cached.value.get("etag"):
+            headers["If-None-Match"] = cached.value["etag"]
+        if cached.value.get("last_modified"):
+            headers["If-Modified-Since"] = cached.value["last_modified"]
+    return headers
+
+def _handle_article_response(url: str, cached: CacheEntry | None, status_code: int, headers, html: str) -> str:
+    """
+    Turns a (possibly conditional) article response into text and updates the article cache.
+    """
+    cache = get_article_cache()
+    if status_code == 304 and cached is not None:
+        cache.touch(normalize_url(url))
+        return cached.value["text"]
+    if status_code == 200:
+        out_text = extract_text(html)
+        if cache is not None:
+            cache.set(normalize_url(url), {
+                "text": out_text,
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                })
+        return out_text
+    else:
+        return ""
+
+def _cached_article(url: str) -> CacheEntry | None:
+    cache = get_article_cache()
+    if cache is None:
+        return None
+    return cache.get(normalize_url(url))
+
 @traceable
 def get_text_content(url: str) -> str:
     """
     Fetches the HTML content of a given URL.
+    Cached articles are reused as is for ARTICLE_CACHE_REVALIDATE_AFTER seconds and then revalidated
+    with a conditional request.
     """
+    cached = _cached_article(url)
+    if cached is not None and cached.age < settings.ARTICLE_CACHE_REVALIDATE_AFTER:
+        return cached.value["text"]
     try: 
         print(f"Fetching: {url}")
-        response = requests.get(url, timeout=10)
+        response = get_scraping_client().get(url, headers=_conditional_headers(cached))
     except requests.RequestException as e:
         print(f"Error fetching {url}: {e}")
         return ""
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.text, "html.parser")
-        for tag in soup(["script", "style", "footer", "nav", "aside", "noscript"]):
-            tag.decompose()
-        article = soup.find("article")
-        if article:
-            out_text = article.get_text(" ", strip=True)
-        else: 
-            out_text = soup.get_text(" ", strip=True)
-        return out_text
-    else:
+    return _handle_article_response(url, cached, response.status_code, response.headers, response.text)
+
+@traceable
+async def aget_text_content(url: str) -> str:
+    """
+    Async version of get_text_content. Concurrency, per-domain rate and deadline
+    are enforced by the scraping client.
+    """
+    cached = await asyncio.to_thread(_cached_article, url)
+    if cached is not None and cached.age < settings.ARTICLE_CACHE_REVALIDATE_AFTER:
+        return cached.value["text"]
+    try:
+        print(f"Fetching: {url}")
+        response = await get_scraping_client().aget(url, headers=_conditional_headers(cached))
+    except (httpx.HTTPError, asyncio.TimeoutError) as e:
+        print(f"Error fetching {url}: {e!r}")
         return ""
+    # parsing is CPU bound, keep it off the event loop
+    return await asyncio.to_thread(_handle_article_response, url, cached, response.status_code, response.headers, response.text)
 
 def create_stripe_customer(user_email: str):
     """
@@ -110,14 +280,12 @@ async def update_user_subscription(stripe_customer_id: str, subscription_id: str
         await session.commit()
 
 def send_email(email: str, subject: str, html_content: str):
-    message = MIMEMultipart("alternative")
-    message["From"] = settings.EMAIL_ADDRESS
-    message["To"] = email
-    message["Subject"] = subject
-    html_part = MIMEText(html_content, "html")
-    message.attach(html_part)
-
-    with SMTP_SSL('smtp.gmail.com', 465) as server:
+    """
+    Sends a single email over its own connection. Bulk sends should reuse a mailer.SMTPMailer.
+    """
+    message = build_message(email, subject, html_content, sender=settings.EMAIL_ADDRESS)
+
+    with SMTP_SSL(settings.SMTP_HOST, settings.SMTP_PORT) as server:
         server.ehlo()
         server.login(settings.EMAIL_ADDRESS, settings.EMAIL_PASSWORD)
         server.send_message(message)
@@ -0,0 +1,155 @@
+"""
+bench_extractors.py
+
+Offline benchmark of the HTML extractor backends used by backend.tools.get_text_content.
+Every backend runs in its own subprocess over the pages in benchmarks/corpus so that peak RSS
+is measured per backend. The pages are synthetic, see benchmarks.make_corpus.
+
+Usage:
+    python -m benchmarks.bench_extractors
+    python -m benchmarks.bench_extractors --backends soup stream --repeat 20 --json bench.json
+    python -m benchmarks.bench_extractors --baseline bench.json --max-regression 0.25
+"""
+
+import argparse
+import gzip
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+
+
+def load_corpus() -> dict[str, str]:
+    """
+    Loads the saved pages, keyed by file name without extension.
+    """
+    pages = {}
+    for path in sorted(CORPUS_DIR.glob("*.html.gz")):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            pages[path.name.removesuffix(".html.gz")] = f.read()
+    return pages
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_worker(backend: str, repeat: int) -> dict:
+    """
+    Benchmarks one backend in the current process.
+    """
+    from backend.extractors import get_extractor
+
+    extractor = get_extractor(backend)
+    pages = load_corpus()
+    rss_before_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # one traced pass: warms up lazy imports and measures the Python heap peak per page
+    peak_alloc = 0
+    for html in pages.values():
+        tracemalloc.start()
+        extractor(html)
+        peak_alloc = max(peak_alloc, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages.values():
+            t0 = time.perf_counter()
+            extractor(html)
+            latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    rss_after_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {
+        "backend": backend,
+        "pages": len(latencies),
+        "pages_per_sec": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_rss_mb": rss_after_kb / 1024,
+        "peak_rss_delta_mb": (rss_after_kb - rss_before_kb) / 1024,
+        "peak_alloc_mb": peak_alloc / (1024 * 1024),
+    }
+
+
+def run_backend(backend: str, repeat: int) -> dict:
+    """
+    Runs the worker of one backend in a fresh interpreter and returns its result.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_extractors", "--worker", backend, "--repeat", str(repeat)],
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).parent.parent,
+    )
+    if completed.returncode != 0:
+        return {"backend": backend, "error": completed.stderr.strip().splitlines()[-1]}
+    return json.loads(completed.stdout)
+
+
+def print_table(results: list[dict]):
+    print(f"{'backend':<10}{'pages/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'peak RSS MB':>14}{'RSS delta MB':>14}{'heap peak MB':>14}")
+    for result in results:
+        if "error" in result:
+            print(f"{result['backend']:<10}  skipped: {result['error']}")
+            continue
+        print(
+            f"{result['backend']:<10}{result['pages_per_sec']:>10.1f}{result['p50_ms']:>10.2f}"
+            f"{result['p99_ms']:>10.2f}{result['peak_rss_mb']:>14.1f}{result['peak_rss_delta_mb']:>14.1f}"
+            f"{result['peak_alloc_mb']:>14.1f}"
+        )
+
+
+def check_regressions(results: list[dict], baseline_path: Path, max_regression: float) -> list[str]:
+    """
+    Compares latency and heap peak against a previous --json output.
+    """
+    baseline = {result["backend"]: result for result in json.loads(baseline_path.read_text())}
+    failures = []
+    for result in results:
+        previous = baseline.get(result["backend"])
+        if previous is None or "error" in result or "error" in previous:
+            continue
+        for metric in ("p50_ms", "p99_ms", "peak_alloc_mb"):
+            if result[metric] > previous[metric] * (1 + max_regression):
+                failures.append(f"{result['backend']} {metric}: {previous[metric]:.2f} -> {result[metric]:.2f}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML extractor backends on the saved page corpus.")
+    parser.add_argument("--backends", nargs="+", default=["soup", "stream", "lxml"])
+    parser.add_argument("--repeat", type=int, default=10, help="passes over the corpus per backend")
+    parser.add_argument("--json", type=Path, help="write results to this file")
+    parser.add_argument("--baseline", type=Path, help="results of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed relative increase of latency and heap peak")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.repeat)))
+        return
+
+    results = [run_backend(backend, args.repeat) for backend in args.backends]
+    print_table(results)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        failures = check_regressions(results, args.baseline, args.max_regression)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+make_corpus.py
+
+Generates the pages of benchmarks/corpus. They are synthetic news pages rather than saved ones,
+so that the corpus can be checked in without third party content: a headline, byline and body
+paragraphs with ad slots and figures, inside an <article> or a plain <div>, under layers of
+wrapper divs, between navigation, related stories, a footer and inline scripts and styles.
+The sizes and the amount of boilerplate around the story are set per page in PAGES.
+Output is seeded and gzipped without a timestamp, so reruns give identical files.
+
+Usage:
+    python -m benchmarks.make_corpus
+    python -m benchmarks.make_corpus --seed 7 --out /tmp/corpus
+"""
+
+import argparse
+import gzip
+import random
+from pathlib import Path
+from benchmarks.bench_extractors import CORPUS_DIR
+
+WORDS = (
+    "the city council officials said on monday that new policy would affect thousands of residents across region "
+    "according to report released by state department economy growth inflation market investors shares rose fell percent "
+    "president minister election campaign voters survey court judge ruling federal government agency weather storm "
+    "coast emergency crews team season coach players game fans stadium company announced quarterly earnings revenue "
+    "technology startup launch product customers data privacy researchers study health hospital patients doctors"
+).split()
+
+# name: (inside <article>, body paragraphs, KB of inline scripts, KB of inline styles, wrapper divs)
+PAGES = {
+    "small_article": (True, 6, 8, 2, 3),
+    "small_no_article": (False, 6, 8, 2, 3),
+    "medium_article": (True, 30, 120, 30, 10),
+    "medium_no_article": (False, 30, 120, 30, 10),
+    "large_article": (True, 120, 1200, 150, 25),
+    "large_no_article": (False, 120, 1200, 150, 25),
+}
+
+
+class PageGenerator:
+    """
+    Builds news-like pages from a seeded random source. The order of the calls matters: the same
+    seed and the same pages in the same order give the same HTML.
+    """
+    def __init__(self, seed: int):
+        self.random = random.Random(seed)
+
+    def sentence(self) -> str:
+        words = [self.random.choice(WORDS) for _ in range(self.random.randint(8, 22))]
+        return " ".join(words).capitalize() + "."
+
+    def paragraph(self) -> str:
+        return " ".join(self.sentence() for _ in range(self.random.randint(2, 6)))
+
+    def script_blob(self, kb: int) -> str:
+        lines, size = [], 0
+        while size < kb * 1024:
+            line = (
+                f"window.__DATA_{self.random.randint(0, 1 << 30)} = {{\"id\": {self.random.randint(0, 10**9)}, "
+                f"\"html\": \"<div class=\\\"ad\\\">{self.random.choice(WORDS)}</div>\", "
+                f"\"t\": [{','.join(str(self.random.randint(0, 999)) for _ in range(30))}]}};\n"
+            )
+            lines.append(line)
+            size += len(line)
+        return "<script>" + "".join(lines) + "</script>"
+
+    def style_blob(self, kb: int) -> str:
+        rules, size = [], 0
+        while size < kb * 1024:
+            rule = f".c{self.random.randint(0, 10**6)}{{margin:{self.random.randint(0, 40)}px;color:#{self.random.randint(0, 0xffffff):06x};display:flex}}\n"
+            rules.append(rule)
+            size += len(rule)
+        return "<style>" + "".join(rules) + "</style>"
+
+    def nav(self) -> str:
+        items = "".join(f"<li class='nav-item'><a href='/section/{word}'>{word.title()}</a></li>" for word in self.random.sample(WORDS, 15))
+        return f"<nav class='site-nav'><ul>{items}</ul></nav>"
+
+    def aside(self) -> str:
+        cards = "".join(f"<div class='card'><a href='/story/{i}'>{self.sentence()}</a></div>" for i in range(8))
+        return f"<aside class='related'><h3>Related</h3>{cards}</aside>"
+
+    def footer(self) -> str:
+        return "<footer><p>&copy; 2025 Example News Network. All rights reserved.</p><p><a href='/privacy'>Privacy</a> | <a href='/terms'>Terms</a></p></footer>"
+
+    def body(self, paragraphs: int) -> str:
+        parts = []
+        for i in range(paragraphs):
+            parts.append(f"<p class='body-text'>{self.paragraph()}</p>")
+            if i % 5 == 4:
+                parts.append(f"<div class='ad-slot' data-slot='{i}'><!-- ad --><noscript><img src='/px.gif'></noscript></div>")
+            if i % 7 == 6:
+                parts.append(f"<figure><img src='/img/{i}.jpg' alt='photo'><figcaption>{self.sentence()}</figcaption></figure>")
+        return "".join(parts)
+
+    def page(self, article: bool, paragraphs: int, script_kb: int, style_kb: int, wrappers: int) -> str:
+        head = f"<head><meta charset='utf-8'><title>{self.sentence()} - Example News</title>{self.style_blob(style_kb)}{self.script_blob(script_kb // 2)}</head>"
+        story = f"<h1 class='headline'>{self.sentence()}</h1><div class='byline'>By Staff Reporter | Updated 2025-08-13</div>{self.body(paragraphs)}"
+        if article:
+            story = f"<article class='story'>{story}</article>"
+        else:
+            story = f"<div class='story-body' id='content'>{story}</div>"
+        for i in range(wrappers):
+            story = f"<div class='wrap-{i}'>{story}</div>"
+        return (
+            f"<!DOCTYPE html><html lang='en'>{head}<body>{self.nav()}<header><div class='logo'>Example News</div></header>"
+            f"<main>{story}{self.aside()}</main>{self.script_blob(script_kb // 2)}{self.footer()}</body></html>"
+        )
+
+
+def write_corpus(out_dir: Path, seed: int = 2025) -> dict[str, int]:
+    """
+    Writes every page of PAGES to out_dir as <name>.html.gz, returns their uncompressed sizes.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    generator = PageGenerator(seed)
+    sizes = {}
+    for name, spec in PAGES.items():
+        html = generator.page(*spec)
+        with open(out_dir / f"{name}.html.gz", "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+            f.write(html.encode("utf-8"))
+        sizes[name] = len(html)
+    return sizes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the benchmark corpus.")
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--out", type=Path, default=CORPUS_DIR)
+    args = parser.parse_args()
+    for name, size in write_corpus(args.out, args.seed).items():
+        print(f"{name}: {size} bytes")
@@ -0,0 +1,42 @@
+import time
+from backend.cache import DiskCache, MemoryCache
+
+
+def test_disk_cache_roundtrip_and_ttl(tmp_path):
+    cache = DiskCache(tmp_path / "cache.sqlite3", ttl=60, max_bytes=10_000)
+    cache.set("a", {"text": "hello"})
+    assert cache.get("a").value == {"text": "hello"}
+    assert cache.get("missing") is None
+
+    cache.conn.execute("UPDATE entries SET stored_at = ?", (time.time() - 120,))
+    assert cache.get("a") is None
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path / "cache.sqlite3", ttl=60, max_bytes=30)
+    cache.set("a", "x" * 10)
+    cache.set("b", "y" * 10)
+    cache.get("a")
+    cache.set("c", "z" * 10)
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+def test_disk_cache_persists(tmp_path):
+    cache = DiskCache(tmp_path / "cache.sqlite3", ttl=60, max_bytes=10_000)
+    cache.set("a", [1, 2])
+    cache.close()
+    assert DiskCache(tmp_path / "cache.sqlite3", ttl=60, max_bytes=10_000).get("a").value == [1, 2]
+
+
+def test_memory_cache_lru_and_ttl():
+    cache = MemoryCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a").value == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a").value == 1
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert cache.get("c") is None
@@ -0,0 +1,187 @@
+import os
+import pytest
+from typing import TypedDict
+from unittest.mock import Mock
+from langgraph.checkpoint.base import ERROR, empty_checkpoint
+from langgraph.graph import StateGraph, START, END
+from sqlalchemy.dialects import postgresql
+from backend.checkpoint import PostgresCheckpointSaver
+from backend.models import GraphCheckpoint, GraphCheckpointWrite
+
+
+class FakeSession:
+    """Session recording the statements it is given and answering with the scripted results."""
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+
+    async def execute(self, statement, *args):
+        self.statements.append(statement)
+        return self.results.pop(0) if self.results else Mock()
+
+    async def commit(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+def saver_with(session: FakeSession) -> PostgresCheckpointSaver:
+    saver = PostgresCheckpointSaver(Mock())
+    saver.session_factory = lambda: session
+    return saver
+
+def compiled(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+def inserted_rows(statement, model) -> list:
+    """The rows an INSERT statement would store, as model instances."""
+    params = statement.compile(dialect=postgresql.dialect()).params
+    columns = [column for column in model.__table__.columns.keys() if column != "created_at"]
+    if f"{columns[0]}_m0" not in params:
+        return [model(**{column: params[column] for column in columns})]
+    count = sum(1 for key in params if key.startswith(f"{columns[0]}_m"))
+    return [model(**{column: params[f"{column}_m{i}"] for column in columns}) for i in range(count)]
+
+def scalar(row):
+    return Mock(scalar_one_or_none=Mock(return_value=row))
+
+def scalars(rows):
+    return Mock(scalars=Mock(return_value=Mock(all=Mock(return_value=rows))))
+
+async def put_checkpoint(thread_id: str, parent_id: str | None = None, source: str = "loop") -> tuple[dict, GraphCheckpoint]:
+    session = FakeSession()
+    checkpoint = {**empty_checkpoint(), "channel_values": {"country": "US"}}
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if parent_id:
+        configurable["checkpoint_id"] = parent_id
+    returned = await saver_with(session).aput({"configurable": configurable}, checkpoint, {"source": source, "step": 1}, {})
+    assert returned["configurable"]["checkpoint_id"] == checkpoint["id"]
+    [statement] = session.statements
+    sql = compiled(statement)
+    assert "ON CONFLICT (thread_id, checkpoint_ns, checkpoint_id) DO UPDATE" in sql
+    [row] = inserted_rows(statement, GraphCheckpoint)
+    return checkpoint, row
+
+
+def test_next_version_sorts_as_text():
+    saver = PostgresCheckpointSaver(Mock())
+    versions = [None]
+    for _ in range(11):
+        versions.append(saver.get_next_version(versions[-1], None))
+    assert versions[1:] == sorted(versions[1:])
+    assert versions[-1] == f"{11:032}"
+
+@pytest.mark.asyncio
+async def test_checkpoint_round_trip():
+    checkpoint, row = await put_checkpoint("newsletter-US-2026-10-18", parent_id="parent")
+    writes_session = FakeSession()
+    await saver_with(writes_session).aput_writes(
+        {"configurable": {"thread_id": row.thread_id, "checkpoint_ns": "", "checkpoint_id": row.checkpoint_id}},
+        [("newsletter_title", "Big day"), ("newsletter_content", "Story")],
+        task_id="generate_newsletter",
+    )
+    write_rows = inserted_rows(writes_session.statements[0], GraphCheckpointWrite)
+
+    session = FakeSession(scalar(row), scalars(write_rows))
+    checkpoint_tuple = await saver_with(session).aget_tuple({"configurable": {"thread_id": row.thread_id}})
+
+    assert "ORDER BY graph_checkpoints.checkpoint_id DESC" in compiled(session.statements[0])
+    assert checkpoint_tuple.checkpoint["channel_values"] == {"country": "US"}
+    assert checkpoint_tuple.checkpoint["id"] == checkpoint["id"]
+    assert checkpoint_tuple.metadata["source"] == "loop"
+    assert checkpoint_tuple.config["configurable"]["checkpoint_id"] == checkpoint["id"]
+    assert checkpoint_tuple.parent_config["configurable"]["checkpoint_id"] == "parent"
+    assert checkpoint_tuple.pending_writes == [
+        ("generate_newsletter", "newsletter_title", "Big day"),
+        ("generate_newsletter", "newsletter_content", "Story"),
+    ]
+
+@pytest.mark.asyncio
+async def test_aget_tuple_by_id_and_missing():
+    session = FakeSession(scalar(None))
+    config = {"configurable": {"thread_id": "t", "checkpoint_ns": "", "checkpoint_id": "abc"}}
+    assert await saver_with(session).aget_tuple(config) is None
+    sql = compiled(session.statements[0])
+    assert "graph_checkpoints.checkpoint_id = %(checkpoint_id_1)s" in sql
+    assert "ORDER BY" not in sql
+
+@pytest.mark.asyncio
+async def test_aput_writes_upsert_rules():
+    config = {"configurable": {"thread_id": "t", "checkpoint_ns": "", "checkpoint_id": "c"}}
+    session = FakeSession()
+    saver = saver_with(session)
+    await saver.aput_writes(config, [("newsletter_title", "Big day")], task_id="task")
+    await saver.aput_writes(config, [(ERROR, ValueError("boom"))], task_id="task")
+    await saver.aput_writes(config, [], task_id="task")
+
+    regular, error = session.statements
+    # regular writes are kept once, errors replace the previous error of the task
+    assert "ON CONFLICT (thread_id, checkpoint_ns, checkpoint_id, task_id, idx) DO NOTHING" in compiled(regular)
+    assert "DO UPDATE SET channel = excluded.channel" in compiled(error)
+    assert [row.idx for row in inserted_rows(regular, GraphCheckpointWrite)] == [0]
+    assert [row.idx for row in inserted_rows(error, GraphCheckpointWrite)] == [-1]
+
+@pytest.mark.asyncio
+async def test_alist_filters_and_limits():
+    _, first = await put_checkpoint("t", source="input")
+    _, second = await put_checkpoint("t", parent_id=first.checkpoint_id)
+    _, third = await put_checkpoint("t", parent_id=second.checkpoint_id)
+    rows = [third, second, first]
+
+    session = FakeSession(scalars(rows), scalars([]), scalars([]))
+    listed = [item async for item in saver_with(session).alist({"configurable": {"thread_id": "t"}}, filter={"source": "loop"}, limit=1)]
+    assert [item.config["configurable"]["checkpoint_id"] for item in listed] == [third.checkpoint_id]
+
+    session = FakeSession(scalars(rows), scalars([]), scalars([]), scalars([]))
+    listed = [item async for item in saver_with(session).alist({"configurable": {"thread_id": "t"}}, filter={"source": "input"}, before={"configurable": {"checkpoint_id": third.checkpoint_id}})]
+    assert [item.config["configurable"]["checkpoint_id"] for item in listed] == [first.checkpoint_id]
+    assert "graph_checkpoints.checkpoint_id < %(checkpoint_id_1)s" in compiled(session.statements[0])
+
+
+class CountState(TypedDict):
+    count: int
+
+
+@pytest.mark.postgres
+@pytest.mark.asyncio
+@pytest.mark.skipif(not os.environ.get("TEST_DATABASE_URL"), reason="needs a Postgres database in TEST_DATABASE_URL")
+async def test_resume_from_postgres():
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from backend.models.base import Base
+
+    engine = create_async_engine(os.environ["TEST_DATABASE_URL"])
+    tables = [GraphCheckpoint.__table__, GraphCheckpointWrite.__table__]
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all, tables=tables)
+    try:
+        saver = PostgresCheckpointSaver(engine)
+        failures = [RuntimeError("down")]
+        def flaky(state: CountState) -> dict:
+            if failures:
+                raise failures.pop()
+            return {"count": state["count"] + 10}
+        builder = StateGraph(CountState)
+        builder.add_node("increment", lambda state: {"count": state["count"] + 1})
+        builder.add_node("flaky", flaky)
+        builder.add_edge(START, "increment")
+        builder.add_edge("increment", "flaky")
+        builder.add_edge("flaky", END)
+        graph = builder.compile(checkpointer=saver)
+        config = {"configurable": {"thread_id": "test-resume"}}
+
+        with pytest.raises(RuntimeError):
+            await graph.ainvoke({"count": 0}, config)
+        assert (await graph.aget_state(config)).next == ("flaky",)
+        assert await graph.ainvoke(None, config) == {"count": 11}
+        history = [snapshot async for snapshot in graph.aget_state_history(config)]
+        assert history[0].values == {"count": 11}
+        await saver.adelete_thread("test-resume")
+        assert await saver.aget_tuple(config) is None
+    finally:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all, tables=tables)
+        await engine.dispose()
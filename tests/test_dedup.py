@@ -0,0 +1,24 @@
+from backend.dedup import dedupe, near_duplicate_clusters
+
+STORY = ("The federal judge said on Wednesday that she needs more time to decide whether the detention "
+         "center in the Florida Everglades can keep operating while environmental groups pursue their lawsuit.")
+
+
+def test_near_duplicate_clusters():
+    texts = [
+        STORY,
+        "A storm is expected to bring heavy rain to the coast this weekend, forecasters warned on Thursday.",
+        "AP - " + STORY + " Read more on our site.",
+        STORY.replace("Wednesday", "Tuesday"),
+    ]
+    assert near_duplicate_clusters(texts, threshold=0.6) == [[0, 2, 3], [1]]
+
+def test_dedupe_keeps_first_of_each_cluster():
+    posts = [
+        {"title": "Judge delays ruling", "text": STORY},
+        {"title": "Storm warning", "text": "Heavy rain expected on the coast this weekend."},
+        {"title": "Judge delays decision on detention center", "text": STORY},
+    ]
+    kept = dedupe(posts, lambda post: post["text"], threshold=0.6)
+    assert [post["title"] for post in kept] == ["Judge delays ruling", "Storm warning"]
+    assert dedupe([], lambda post: post["text"], threshold=0.6) == []
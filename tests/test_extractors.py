@@ -0,0 +1,53 @@
+import pytest
+from backend.extractors import extract_text_soup, extract_text_stream, extract_text_lxml, get_extractor
+from benchmarks.bench_extractors import load_corpus
+from benchmarks.make_corpus import PAGES as CORPUS_PAGES, PageGenerator
+
+PAGES = [
+    "",
+    "plain text only",
+    "<html><head><title>Title</title><style>p {color: red}</style></head><body><p>Hello</p><p>world</p></body></html>",
+    "<!DOCTYPE html><html><body><nav><a href='/'>Home</a></nav><article><h1>Headline</h1><p>First &amp; second</p></article><footer>(c) 2025</footer></body></html>",
+    "<body><aside><article>Sidebar story</article></aside><div>Intro</div><article><p>Main <b>story</b> text</p></article><article>Second story</article></body>",
+    "<body><article>Outer <article>inner</article> tail</article><p>after</p></body>",
+    "<body><div>foo<!-- comment -->bar</div><script>var s = '</div><article>fake</article>';</script><p>baz</p></body>",
+    "<body><div><p>unclosed paragraph<p>another one</div> stray</span> end</body>",
+    "<body><article><p>Line one<br>line two<img src='x.png'/> line three</p><noscript>enable js</noscript></article></body>",
+    "<body>\n  <div>\n    spaced   out \n  </div>\n\n <p>&nbsp;text&#39;s&nbsp;</p></body>",
+    "<body><article><div>Open article without closing tag<p>and more",
+    "<body><nav><ul><li>menu</li></ul></nav><main><h2>News</h2><p>Body</p></main><footer><p>Footer</p></footer></body>",
+    "<body><article><p>a<br>b</br>c</p><p>d<img src='x.png'>e</img>f</p></article></body>",
+]
+
+
+@pytest.mark.parametrize("html", PAGES)
+def test_stream_extractor_matches_soup(html):
+    assert extract_text_stream(html) == extract_text_soup(html)
+
+@pytest.mark.parametrize("html", [
+    "<p>a<br>b</br>c</p>",
+    "<p>a</br>b</p>",
+    "<p>a<br/>b</br>c</p>",
+    "<p>a<br>b<br/>c</br>d</p>",
+    "<p>a<br>b<br>c</br>d</br>e</br>f</p>",
+])
+def test_stream_extractor_matches_soup_on_stray_void_end_tags(html):
+    assert extract_text_stream(html) == extract_text_soup(html)
+
+@pytest.mark.parametrize("html", PAGES)
+def test_lxml_extractor_matches_soup(html):
+    pytest.importorskip("lxml")
+    assert " ".join(extract_text_lxml(html).split()) == " ".join(extract_text_soup(html).split())
+
+@pytest.mark.parametrize("name, html", load_corpus().items())
+def test_stream_extractor_matches_soup_on_corpus(name, html):
+    assert extract_text_stream(html) == extract_text_soup(html)
+
+def test_corpus_is_reproducible():
+    # the first page is generated first, so it is enough to catch a drift of the generator
+    assert PageGenerator(2025).page(*CORPUS_PAGES["small_article"]) == load_corpus()["small_article"]
+
+def test_get_extractor():
+    assert get_extractor("stream") is extract_text_stream
+    with pytest.raises(ValueError):
+        get_extractor("regex")
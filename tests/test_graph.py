@@ -0,0 +1,132 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import Mock, AsyncMock
+from langchain_core.messages import AIMessage
+from contextlib import asynccontextmanager
+from backend.graph import generate_newsletter, fix_json, summarize_articles, build_curation_agent, newsletter_thread_id
+from backend.state import AgentState
+
+
+NO_RETRY_POLICY = {"deadline": 5.0, "max_attempts": 1, "backoff_base": 0.0, "backoff_max": 0.0, "hedge_after": None}
+
+def fake_chat_model(*contents):
+    chat_model = Mock()
+    chat_model.ainvoke = AsyncMock(side_effect=[AIMessage(content=content) for content in contents])
+    return chat_model
+
+@pytest.mark.asyncio
+async def test_generate_newsletter(mocker):
+    chat_model = fake_chat_model(json.dumps({"Title": "Big day", "Content": "Story"}))
+    mocker.patch("backend.graph.get_route_models", return_value=[chat_model])
+    state = AgentState(trending_news=[{"title": "News", "content": "Something happened."}])
+
+    state = await generate_newsletter(state)
+
+    assert state.newsletter_title == "Big day"
+    assert state.newsletter_content == "Story"
+    chat_model.ainvoke.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_generate_newsletter_times_out(mocker):
+    async def never_answers(messages, **kwargs):
+        await asyncio.sleep(10)
+    chat_model = Mock()
+    chat_model.ainvoke = never_answers
+    mocker.patch("backend.graph.get_route_models", return_value=[chat_model])
+    mocker.patch("backend.llm.settings.LLM_TIMEOUT", 0.01)
+    mocker.patch("backend.resilience.settings.LLM_POLICY", NO_RETRY_POLICY)
+
+    with pytest.raises(TimeoutError):
+        await generate_newsletter(AgentState(trending_news=[{"title": "News", "content": "Something happened."}]))
+
+@pytest.mark.asyncio
+async def test_fix_json_skips_valid_newsletter(mocker):
+    get_route_models = mocker.patch("backend.graph.get_route_models")
+    state = await fix_json(AgentState(newsletter_title="Big day", newsletter_content="Story"))
+    assert state.newsletter_title == "Big day"
+    get_route_models.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_summarize_articles_concurrently(mocker):
+    in_flight = 0
+    peak = 0
+    async def fake_ainvoke(messages, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if "Title: News 3" in messages[0].content:
+            raise TimeoutError()
+        return AIMessage(content="<think>short</think>A summary.")
+    chat_model = Mock()
+    chat_model.ainvoke = fake_ainvoke
+    mocker.patch("backend.graph.get_route_models", return_value=[chat_model])
+    mocker.patch("backend.graph.settings.NEWSLETTER_ARTICLE_COUNT", 10)
+    mocker.patch("backend.graph.settings.NEWSLETTER_SUMMARY_CONCURRENCY", 4)
+    mocker.patch("backend.resilience.settings.LLM_POLICY", NO_RETRY_POLICY)
+    news = [{"title": f"News {i}", "content": f"Lead of story {i}. More details."} for i in range(12)]
+
+    update = await summarize_articles(AgentState(trending_news=news))
+
+    summaries = update["article_summaries"]
+    assert [summary["title"] for summary in summaries] == [f"News {i}" for i in range(10)]
+    assert summaries[0]["content"] == "A summary."
+    # a failed summary falls back to the article itself
+    assert summaries[3]["content"] == "Lead of story 3. More details."
+    assert peak == 4
+
+@pytest.mark.asyncio
+async def test_generate_newsletter_from_summaries(mocker):
+    chat_model = fake_chat_model(json.dumps({"Title": "Big day", "Content": "Story"}))
+    mocker.patch("backend.graph.get_route_models", return_value=[chat_model])
+    state = AgentState(
+        trending_news=[{"title": "News", "content": "The full article."}],
+        article_summaries=[{"title": "News", "content": "The summary."}],
+    )
+
+    await generate_newsletter(state)
+
+    prompt = chat_model.ainvoke.await_args.args[0][0].content
+    assert "The summary." in prompt
+    assert "The full article." not in prompt
+
+
+@pytest.mark.asyncio
+async def test_graph_generates_both_emails_concurrently(mocker):
+    mocker.patch("backend.graph.afetch_news_api", AsyncMock(return_value={"trending_news": [{"title": "News", "content": "Something happened."}]}))
+    in_flight = 0
+    peak = 0
+    async def fake_ainvoke(messages, **kwargs):
+        nonlocal in_flight, peak
+        human = messages[-1].content
+        if "newsletter" in human and "email" not in human:
+            return AIMessage(content=json.dumps({"Title": "Big day", "Content": "Story"}))
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        audience = "non-sub" if "non-subscribers" in human else "sub"
+        return AIMessage(content=json.dumps({"Subject": f"{audience} subject", "HTML": f"<p>{audience}</p>"}))
+    chat_model = Mock()
+    chat_model.ainvoke = fake_ainvoke
+    mocker.patch("backend.graph.get_route_models", return_value=[chat_model])
+
+    session = AsyncMock()
+    session.add = Mock()
+    @asynccontextmanager
+    async def fake_session():
+        yield session
+    mocker.patch("backend.graph.get_pg_async_session", fake_session)
+    send_campaign = mocker.patch("backend.graph.send_campaign", AsyncMock())
+
+    final_state = await build_curation_agent().ainvoke({})
+
+    assert peak == 2
+    assert final_state["agent_type"] == "marketing"
+    send_campaign.assert_awaited_once()
+    key, *emails = send_campaign.await_args.args
+    assert key == newsletter_thread_id("US")
+    assert emails == ["sub subject", "<p>sub</p>", "non-sub subject", "<p>non-sub</p>"]
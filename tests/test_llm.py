@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+from unittest.mock import Mock, AsyncMock
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from backend.cache import DiskCache, MemoryCache
+from backend.llm import TieredLLMCache, get_chat_model, get_route_models, ainvoke_chat, ainvoke_with_fallbacks, aclose_chat_models
+from backend.settings import settings
+
+
+@pytest.mark.asyncio
+async def test_get_chat_model_reuses_clients(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CACHE_ENABLED", False)
+    await aclose_chat_models()
+    default = get_chat_model()
+    assert get_chat_model() is default
+    deterministic = get_chat_model(temperature=0)
+    assert deterministic is not default
+    assert deterministic.temperature == 0
+    assert get_chat_model(model="other/model") is not default
+    # one connection pool per base URL, capped at LLM_MAX_CONNECTIONS
+    assert deterministic.http_async_client is default.http_async_client
+    assert default.http_async_client._transport._pool._max_connections == settings.LLM_MAX_CONNECTIONS
+    pool = default.http_async_client
+    await aclose_chat_models()
+    assert pool.is_closed
+    assert get_chat_model() is not default
+    # the OpenRouter key is not sent to other hosts
+    with pytest.raises(ValueError):
+        get_chat_model(base_url="http://elsewhere.test/v1")
+
+
+def test_chat_models_are_bound_to_their_event_loop(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CACHE_ENABLED", False)
+    async def models():
+        return get_chat_model(), get_chat_model()
+    first_loop, second_loop = asyncio.new_event_loop(), asyncio.new_event_loop()
+    try:
+        first, same = first_loop.run_until_complete(models())
+        second, _ = second_loop.run_until_complete(models())
+        assert first is same
+        assert second is not first
+        assert second.http_async_client is not first.http_async_client
+        first_loop.run_until_complete(aclose_chat_models())
+        assert first.http_async_client.is_closed
+        assert not second.http_async_client.is_closed
+        second_loop.run_until_complete(aclose_chat_models())
+    finally:
+        first_loop.close()
+        second_loop.close()
+
+
+def _fake_model(cache, answers):
+    return GenericFakeChatModel(messages=iter(AIMessage(answer) for answer in answers), cache=cache)
+
+
+def test_llm_cache_returns_stored_answer(tmp_path):
+    cache = TieredLLMCache(MemoryCache(16, ttl=60), DiskCache(tmp_path / "llm.sqlite3", ttl=60, max_bytes=1_000_000))
+    model = _fake_model(cache, ["first", "second", "third"])
+    assert model.invoke([HumanMessage("hello")]).content == "first"
+    assert model.invoke([HumanMessage("hello")]).content == "first"
+    assert model.invoke([HumanMessage("something else")]).content == "second"
+
+
+def test_llm_cache_disk_tier_survives_restart(tmp_path):
+    path = tmp_path / "llm.sqlite3"
+    model = _fake_model(TieredLLMCache(MemoryCache(16, ttl=60), DiskCache(path, ttl=60, max_bytes=1_000_000)), ["cached"])
+    assert model.invoke([HumanMessage("hello")]).content == "cached"
+    restarted = _fake_model(TieredLLMCache(MemoryCache(16, ttl=60), DiskCache(path, ttl=60, max_bytes=1_000_000)), ["fresh"])
+    answer = restarted.invoke([HumanMessage("hello")])
+    assert isinstance(answer, AIMessage)
+    assert answer.content == "cached"
+
+
+@pytest.mark.asyncio
+async def test_get_route_models(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "LLM_ROUTES", {"fix_json": ["light", "heavy"], "broken": ["medium"]})
+    await aclose_chat_models()
+    light, heavy = get_route_models("fix_json", temperature=0)
+    assert light.model_name == settings.LLM_MODEL_LIGHT
+    assert light.openai_api_key.get_secret_value() == settings.LLM_MODEL_LIGHT_API_KEY
+    assert heavy.openai_api_key.get_secret_value() == settings.OPENROUTER_API_KEY
+    assert heavy is get_chat_model(temperature=0)
+    assert get_route_models("unrouted_node") == [get_chat_model()]
+    with pytest.raises(ValueError):
+        get_route_models("broken")
+    await aclose_chat_models()
+
+
+@pytest.mark.asyncio
+async def test_ainvoke_with_fallbacks():
+    light = Mock(ainvoke=AsyncMock(side_effect=ConnectionError("ollama is down")))
+    heavy = Mock(ainvoke=AsyncMock(return_value=AIMessage("answer")))
+    assert (await ainvoke_with_fallbacks([light, heavy], [HumanMessage("hello")])).content == "answer"
+    with pytest.raises(ConnectionError):
+        await ainvoke_with_fallbacks([light], [HumanMessage("hello")])
+
+
+@pytest.mark.asyncio
+async def test_ainvoke_chat_honours_zero_timeout():
+    model = Mock(ainvoke=AsyncMock(return_value=AIMessage("answer")))
+    with pytest.raises(TimeoutError):
+        await ainvoke_chat(model, [HumanMessage("hello")], timeout=0)
+    assert (await ainvoke_chat(model, [HumanMessage("hello")])).content == "answer"
@@ -0,0 +1,169 @@
+import asyncio
+import email
+import email.policy
+import smtplib
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+from backend.mailer import SMTPMailer, MessageTemplate, ProviderLimits, build_message, deliver, is_transient_error, provider_limits
+
+
+def make_mailer(mocker, **kwargs):
+    servers = []
+    def connect(*args, **kw):
+        servers.append(MagicMock())
+        return servers[-1]
+    mocker.patch("backend.mailer.smtplib.SMTP_SSL", side_effect=connect)
+    options = {"max_messages_per_connection": 100, "timeout": 5.0, **kwargs}
+    return SMTPMailer("smtp.test.com", 465, "sender@test.com", "senderpass", **options), servers
+
+def test_mailer_reuses_connection(mocker):
+    mailer, servers = make_mailer(mocker)
+    with mailer:
+        for i in range(5):
+            mailer.send(build_message(f"user{i}@test.com", "Subject", "<p>Hi</p>"))
+    assert len(servers) == 1
+    servers[0].login.assert_called_once_with("sender@test.com", "senderpass")
+    assert servers[0].send_message.call_count == 5
+    servers[0].quit.assert_called_once()
+
+def test_mailer_recycles_connection(mocker):
+    mailer, servers = make_mailer(mocker, max_messages_per_connection=2)
+    for i in range(5):
+        mailer.send(build_message(f"user{i}@test.com", "Subject", "<p>Hi</p>"))
+    assert [server.send_message.call_count for server in servers] == [2, 2, 1]
+    servers[0].quit.assert_called_once()
+
+def test_mailer_reconnects_after_drop(mocker):
+    mailer, servers = make_mailer(mocker)
+    mailer.send(build_message("user0@test.com", "Subject", "<p>Hi</p>"))
+    servers[0].send_message.side_effect = smtplib.SMTPServerDisconnected()
+    message = build_message("user1@test.com", "Subject", "<p>Hi</p>")
+    mailer.send(message)
+    assert len(servers) == 2
+    servers[1].send_message.assert_called_once_with(message)
+    assert mailer.connections == 2
+
+def test_mailer_drops_connection_after_timeout(mocker):
+    mailer, servers = make_mailer(mocker)
+    mailer.send(build_message("user0@test.com", "Subject", "<p>Hi</p>"))
+    servers[0].send_message.side_effect = TimeoutError()
+    with pytest.raises(TimeoutError):
+        mailer.send(build_message("user1@test.com", "Subject", "<p>Hi</p>"))
+    servers[0].close.assert_called_once()
+    servers[0].quit.assert_not_called()
+    mailer.send(build_message("user2@test.com", "Subject", "<p>Hi</p>"))
+    assert len(servers) == 2
+    servers[1].send_message.assert_called_once()
+
+def test_mailer_keeps_connection_after_rejected_recipient(mocker):
+    mailer, servers = make_mailer(mocker)
+    mailer.send(build_message("user0@test.com", "Subject", "<p>Hi</p>"))
+    servers[0].send_message.side_effect = [smtplib.SMTPRecipientsRefused({"gone@test.com": (550, b"no such user")}), None]
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        mailer.send(build_message("gone@test.com", "Subject", "<p>Hi</p>"))
+    mailer.send(build_message("user1@test.com", "Subject", "<p>Hi</p>"))
+    assert len(servers) == 1
+
+
+class FakeMailer:
+    """Mailer taking 20ms per message, recording the peak number of concurrent sends."""
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+    sent = []
+
+    def send(self, message):
+        with FakeMailer.lock:
+            FakeMailer.in_flight += 1
+            FakeMailer.peak = max(FakeMailer.peak, FakeMailer.in_flight)
+        time.sleep(0.02)
+        with FakeMailer.lock:
+            FakeMailer.in_flight -= 1
+        if message["To"] == "bounce@test.com":
+            raise smtplib.SMTPRecipientsRefused({message["To"]: (550, b"no such user")})
+        FakeMailer.sent.append(message["To"])
+
+    def close(self):
+        pass
+
+@pytest.mark.asyncio
+async def test_deliver_sends_concurrently():
+    FakeMailer.peak, FakeMailer.sent = 0, []
+    messages = [build_message(f"user{i}@test.com", "Subject", "<p>Hi</p>") for i in range(20)]
+    messages.append(build_message("bounce@test.com", "Subject", "<p>Hi</p>"))
+
+    report = await deliver(messages, ProviderLimits(concurrency=4, rate_per_second=1000), FakeMailer, report_every=10)
+
+    assert report.sent == 20
+    assert report.failed == 1
+    assert FakeMailer.peak == 4
+    assert sorted(FakeMailer.sent) == sorted(f"user{i}@test.com" for i in range(20))
+    assert report.messages_per_second > 0
+
+@pytest.mark.asyncio
+async def test_deliver_respects_rate_limit():
+    messages = [build_message(f"user{i}@test.com", "Subject", "<p>Hi</p>") for i in range(6)]
+    start = time.perf_counter()
+    report = await deliver(messages, ProviderLimits(concurrency=2, rate_per_second=20), FakeMailer)
+    # 2 tokens up front, then 4 more at 20 per second
+    assert time.perf_counter() - start >= 0.2
+    assert report.sent == 6
+
+@pytest.mark.asyncio
+async def test_deliver_stops_on_rejected_login():
+    class RejectedMailer:
+        def send(self, message):
+            raise smtplib.SMTPAuthenticationError(535, b"bad credentials")
+        def close(self):
+            pass
+    messages = [build_message(f"user{i}@test.com", "Subject", "<p>Hi</p>") for i in range(50)]
+    with pytest.raises(smtplib.SMTPAuthenticationError):
+        await asyncio.wait_for(deliver(messages, ProviderLimits(concurrency=2, rate_per_second=1000), RejectedMailer), 5)
+
+def test_is_transient_error():
+    assert is_transient_error(smtplib.SMTPServerDisconnected())
+    assert is_transient_error(TimeoutError())
+    assert is_transient_error(smtplib.SMTPResponseException(421, b"too many connections"))
+    assert is_transient_error(smtplib.SMTPRecipientsRefused({"a@test.com": (450, b"mailbox busy")}))
+    assert not is_transient_error(smtplib.SMTPRecipientsRefused({"a@test.com": (550, b"no such user")}))
+    assert not is_transient_error(smtplib.SMTPDataError(554, b"rejected"))
+    assert not is_transient_error(ValueError("bad address"))
+
+def test_provider_limits(mocker):
+    mocker.patch("backend.mailer.settings.SMTP_CONCURRENCY", None)
+    mocker.patch("backend.mailer.settings.SMTP_RATE_PER_SECOND", None)
+    assert provider_limits("smtp.gmail.com").rate_per_second == 1.0
+    assert provider_limits("email-smtp.eu-west-1.amazonaws.com").concurrency == 10
+    assert provider_limits("mail.example.com") == ProviderLimits(concurrency=4, rate_per_second=5.0)
+    mocker.patch("backend.mailer.settings.SMTP_CONCURRENCY", 16)
+    assert provider_limits("smtp.gmail.com").concurrency == 16
+
+def test_message_template_renders_recipient_fields():
+    body = "<p>Hé {{name}},</p>\n" + "<p>" + "x" * 200 + "</p>\n<a href=\"{{unsubscribe_url}}\">unsubscribe</a> {{name}}"
+    template = MessageTemplate("Nouvelles du jour é", body, sender="news@test.com", fields=("name",), unsubscribe_url="https://test.com/unsub?email={email}")
+
+    rendered = template.render("a+b@test.com", name="Ann & co")
+
+    assert all(len(line) <= 78 for line in rendered.data.split(b"\r\n"))
+    parsed = email.message_from_bytes(rendered.data, policy=email.policy.default)
+    assert parsed["To"] == "a+b@test.com"
+    assert parsed["From"] == "news@test.com"
+    assert parsed["Subject"] == "Nouvelles du jour é"
+    assert parsed["List-Unsubscribe"] == "<https://test.com/unsub?email=a%2Bb%40test.com>"
+    assert parsed["Message-ID"].endswith("@test.com>")
+    expected = body.replace("{{name}}", "Ann &amp; co").replace("{{unsubscribe_url}}", "https://test.com/unsub?email=a%2Bb%40test.com")
+    assert parsed.get_content().replace("\r\n", "\n") == expected + "\n"
+
+def test_message_template_reuses_encoded_body():
+    template = MessageTemplate("Subject", "<p>Hi</p>", sender="news@test.com")
+    first, second = template.render("user0@test.com"), template.render("user1@test.com")
+    assert first["Message-ID"] != second["Message-ID"]
+    assert first.data.split(b"\r\n\r\n", 1)[1] == second.data.split(b"\r\n\r\n", 1)[1]
+
+def test_mailer_sends_rendered_message_as_is(mocker):
+    mailer, servers = make_mailer(mocker)
+    rendered = MessageTemplate("Subject", "<p>Hi</p>", sender="news@test.com").render("user0@test.com")
+    mailer.send(rendered)
+    servers[0].sendmail.assert_called_once_with("news@test.com", ["user0@test.com"], rendered.data)
@@ -1,9 +1,27 @@
 from fastapi.testclient import TestClient
 from backend.main import app
+from backend.auth import get_admin_user
 
 client = TestClient(app)
 
 def test_main():
     response = client.get("/")
     assert response.status_code == 200
-    assert response.json() == {"message": "Welcome to the Newsletter Agent API"}
\ No newline at end of file
+    assert response.json() == {"message": "Welcome to the Newsletter Agent API"}
+def test_stream_newsletter_run(mocker):
+    async def fake_events(graph, graph_input, config):
+        assert graph_input == {"country": "Japan"}
+        # a preview on its own thread, stopped before anything is saved or emailed
+        assert config["configurable"]["thread_id"].startswith("preview-Japan-")
+        assert graph.interrupt_before_nodes == ["save_newsletter"]
+        yield "node_completed", {"node": "list_trending_news"}
+        yield "done", {"seconds": 1.0}
+    mocker.patch("backend.main.astream_run_events", fake_events)
+    app.dependency_overrides[get_admin_user] = lambda: None
+    try:
+        response = client.get("/admin/newsletter-runs/stream", params={"country": "Japan"})
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text == 'event: node_completed\ndata: {"node": "list_trending_news"}\n\nevent: done\ndata: {"seconds": 1.0}\n\n'
@@ -0,0 +1,169 @@
+import asyncio
+import smtplib
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import Mock, AsyncMock
+from sqlalchemy.dialects import postgresql
+from backend.models import EmailCampaign
+from backend.mailer import ProviderLimits
+from backend.outbox import CampaignConflict, claim_size, claim_statement, create_campaign, drain_campaign, enqueue_recipients, mark_results
+
+
+@pytest.fixture
+def session(mocker):
+    """Database session of the outbox functions, answering queries with campaign 3."""
+    campaign = EmailCampaign(id=3, key="newsletter-US-2026-10-18", sub_subject="Thanks", sub_body="<p>sub</p>", non_sub_subject="Join us", non_sub_body="<p>free</p>")
+    session = AsyncMock()
+    session.execute.return_value = Mock(scalar_one=Mock(return_value=campaign))
+    @asynccontextmanager
+    async def fake_session():
+        yield session
+    mocker.patch("backend.outbox.get_pg_async_session", fake_session)
+    return session
+
+
+def test_claim_statement_skips_locked_rows():
+    sql = str(claim_statement(3, 500, 600).compile(dialect=postgresql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in sql
+    assert "RETURNING email_outbox.id, email_outbox.email, email_outbox.subscribed" in sql
+
+@pytest.mark.asyncio
+async def test_transient_error_leaves_row_claimable(session):
+
+    await mark_results([
+        (1, None),
+        (2, smtplib.SMTPResponseException(451, b"try again later")),
+        (3, ConnectionRefusedError()),
+        (4, smtplib.SMTPRecipientsRefused({"gone@test.com": (550, b"no such user")})),
+    ])
+
+    sent, retried, failed = [call.args for call in session.execute.await_args_list]
+    assert [row["row_id"] for row in retried[1]] == [2, 3]
+    retry = retried[0].compile(dialect=postgresql.dialect())
+    assert "status=CASE WHEN (email_outbox.attempts >=" in str(retry)
+    assert {retry.params["attempts_1"], retry.params["param_1"], retry.params["param_2"]} == {5, "failed", "pending"}
+    assert [row["row_id"] for row in failed[1]] == [4]
+    # pending rows are claimed again once the retry delay since their last claim has passed
+    claim = claim_statement(3, 500, 600, 300).compile(dialect=postgresql.dialect())
+    assert "(email_outbox.claimed_at IS NULL OR email_outbox.claimed_at < now() -" in str(claim)
+    assert claim.params["status_1"] == "pending"
+
+@pytest.mark.asyncio
+async def test_create_campaign_refuses_other_emails(session):
+
+    assert await create_campaign("newsletter-US-2026-10-18", "Thanks", "<p>sub</p>", "Join us", "<p>free</p>") == 3
+    with pytest.raises(CampaignConflict, match="sub_body"):
+        await create_campaign("newsletter-US-2026-10-18", "Thanks", "<p>rewritten</p>", "Join us", "<p>free</p>")
+
+def test_claim_size_fits_in_lease(mocker):
+    mocker.patch("backend.outbox.settings.OUTBOX_BATCH_SIZE", 1000)
+    mocker.patch("backend.outbox.settings.OUTBOX_LEASE_SECONDS", 600)
+    # at 1 msg/s a full batch would still be sending when its lease expires
+    assert claim_size(ProviderLimits(concurrency=3, rate_per_second=1)) == 300
+    assert claim_size(ProviderLimits(concurrency=10, rate_per_second=14)) == 1000
+    assert claim_size(ProviderLimits(concurrency=1, rate_per_second=0.001)) == 1
+
+@pytest.mark.asyncio
+async def test_drain_campaign_marks_results(mocker, session):
+    mocker.patch("backend.outbox.claim_batch", AsyncMock(side_effect=[
+        [(1, "sub@test.com", True), (2, "free@test.com", False)],
+        [(3, "bounce@test.com", False)],
+        [],
+    ]))
+    mark_results = mocker.patch("backend.outbox.mark_results", AsyncMock())
+    release_rows = mocker.patch("backend.outbox.release_rows", AsyncMock())
+    sent = []
+    def send(message):
+        if message["To"] == "bounce@test.com":
+            raise smtplib.SMTPRecipientsRefused({message["To"]: (550, b"no such user")})
+        sent.append((message["To"], message["Subject"]))
+    mocker.patch("backend.mailer.create_mailer", return_value=Mock(send=send))
+
+    report = await drain_campaign(3)
+
+    assert report.sent == 2
+    assert report.failed == 1
+    assert sorted(sent) == [("free@test.com", "Join us"), ("sub@test.com", "Thanks")]
+    results = {row_id: error for call in mark_results.await_args_list for row_id, error in call.args[0]}
+    assert results[1] is None and results[2] is None
+    assert isinstance(results[3], smtplib.SMTPRecipientsRefused)
+    release_rows.assert_awaited_once_with([])
+
+@pytest.mark.asyncio
+async def test_enqueue_recipients_streams_users_in_chunks(mocker):
+    chunks = [[("a@test.com", True), ("b@test.com", False)], [("c@test.com", True)]]
+    async def partitions():
+        for chunk in chunks:
+            yield chunk
+    read_session = AsyncMock()
+    read_session.stream.return_value = Mock(partitions=partitions)
+    write_session = AsyncMock()
+    sessions = iter([read_session, write_session])
+    @asynccontextmanager
+    async def fake_session():
+        yield next(sessions)
+    mocker.patch("backend.outbox.get_pg_async_session", fake_session)
+    mocker.patch("backend.outbox.settings.OUTBOX_BATCH_SIZE", 2)
+
+    assert await enqueue_recipients(3) == 3
+
+    query = read_session.stream.await_args.args[0]
+    assert query.get_execution_options()["yield_per"] == 2
+    read_session.execute.assert_not_awaited()
+    inserts = [call.args[0].compile(dialect=postgresql.dialect()).params for call in write_session.execute.await_args_list]
+    assert [params["email_m0"] for params in inserts] == ["a@test.com", "c@test.com"]
+    # every chunk is committed on its own so delivery can start on it
+    assert write_session.commit.await_count == 2
+
+@pytest.mark.asyncio
+async def test_drain_campaign_waits_for_enqueuing(mocker, session):
+    mocker.patch("backend.outbox.settings.OUTBOX_POLL_SECONDS", 0.01)
+    enqueued = asyncio.Event()
+    async def enqueue():
+        await asyncio.sleep(0.05)
+        enqueued.set()
+    claimed = []
+    async def claim_batch(campaign_id, batch_size):
+        if enqueued.is_set() and not claimed:
+            claimed.append(1)
+            return [(1, "late@test.com", True)]
+        return []
+    mocker.patch("backend.outbox.claim_batch", claim_batch)
+    mocker.patch("backend.outbox.mark_results", AsyncMock())
+    mocker.patch("backend.outbox.release_rows", AsyncMock())
+    sent = []
+    mocker.patch("backend.mailer.create_mailer", return_value=Mock(send=lambda message: sent.append(message["To"])))
+
+    report = await drain_campaign(3, asyncio.create_task(enqueue()))
+
+    assert sent == ["late@test.com"]
+    assert report.sent == 1
+
+@pytest.mark.asyncio
+async def test_drain_campaign_claims_rows_committed_during_last_claim(mocker, session):
+    mocker.patch("backend.outbox.settings.OUTBOX_POLL_SECONDS", 0.01)
+    last_chunk = asyncio.Event()
+    async def enqueue():
+        await last_chunk.wait()
+    enqueuing = asyncio.create_task(enqueue())
+    pending = []
+    async def claim_batch(campaign_id, batch_size):
+        if not last_chunk.is_set():
+            # the final chunk is committed and enqueuing ends while this claim is in flight
+            pending.append((1, "late@test.com", True))
+            last_chunk.set()
+            await enqueuing
+            return []
+        rows = pending[:]
+        pending.clear()
+        return rows
+    mocker.patch("backend.outbox.claim_batch", claim_batch)
+    mocker.patch("backend.outbox.mark_results", AsyncMock())
+    mocker.patch("backend.outbox.release_rows", AsyncMock())
+    sent = []
+    mocker.patch("backend.mailer.create_mailer", return_value=Mock(send=lambda message: sent.append(message["To"])))
+
+    report = await drain_campaign(3, enqueuing)
+
+    assert sent == ["late@test.com"]
+    assert report.sent == 1
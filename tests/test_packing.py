@@ -0,0 +1,33 @@
+from backend.packing import allocate_budget, estimate_tokens, pack_articles, trim_boilerplate, truncate_to_tokens
+
+
+def test_allocate_budget_is_max_min_fair():
+    assert allocate_budget([10, 500, 1000], 600) == [10, 295, 295]
+    assert allocate_budget([10, 20], 600) == [10, 20]
+    assert allocate_budget([], 600) == []
+
+def test_trim_boilerplate():
+    text = "Advertisement. The storm hit the coast on Monday. Subscribe now to get our alerts! Crews are still working."
+    assert trim_boilerplate(text) == "The storm hit the coast on Monday. Crews are still working."
+
+def test_truncate_keeps_lead_sentences():
+    text = "First sentence here. Second sentence here. Third sentence here."
+    assert truncate_to_tokens(text, 12) == "First sentence here. Second sentence here."
+    assert truncate_to_tokens("one two three four five six", 3) == "one two"
+
+def test_pack_articles_fits_budget():
+    articles = [
+        {"title": "Short", "content": "A short story."},
+        {"title": "Long", "content": " ".join(f"Sentence number {i} of a long story." for i in range(500))},
+        {"title": "Longer", "content": " ".join(f"Another sentence number {i} of a longer story." for i in range(900))},
+    ]
+    packed = pack_articles(articles, 1000)
+
+    assert packed[0]["content"] == "A short story."
+    assert packed[1]["content"].startswith("Sentence number 0 of a long story.")
+    assert packed[2]["content"].startswith("Another sentence number 0")
+    total = sum(estimate_tokens(article["title"]) + 12 + estimate_tokens(article["content"]) for article in packed)
+    assert total <= 1000
+    # both long articles get about half of what is left
+    assert estimate_tokens(packed[1]["content"]) > 420
+    assert estimate_tokens(packed[2]["content"]) > 420
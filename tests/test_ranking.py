@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+import pytest
+from backend.ranking import rank_posts, score_posts, social_engagement
+
+NOW = datetime(2025, 8, 14, 6, 0, tzinfo=timezone.utc)
+
+
+def make_post(title, performance_score, likes, published, domain_rank, categories=()):
+    return {
+        "title": title,
+        "url": f"https://news.com/{title}",
+        "published": published,
+        "thread": {
+            "performance_score": performance_score,
+            "domain_rank": domain_rank,
+            "site_categories": list(categories),
+            "social": {"facebook": {"likes": likes, "comments": 0, "shares": 0}, "vk": {"shares": 0}},
+        },
+    }
+
+POSTS = [
+    make_post("old", 6, 100, "2025-08-12T06:00:00.000+00:00", 200),
+    make_post("viral", 6, 5000, "2025-08-14T05:00:00.000+00:00", 200),
+    make_post("popular_site", 6, 100, "2025-08-14T05:00:00.000+00:00", 10),
+    make_post("low", 1, 10, "2025-08-14T05:00:00.000+00:00", 5000, ["top_news_us"]),
+]
+
+
+def test_social_engagement():
+    assert social_engagement(POSTS[1]) == 5000
+    assert social_engagement({"title": "no thread"}) == 0
+
+def test_rank_posts_by_weights():
+    ranked = rank_posts(POSTS, {"performance_score": 1.0, "social": 0.5, "recency": 0.5, "domain_rank": 0.25}, "us", now=NOW)
+    assert [post["title"] for post in ranked] == ["viral", "popular_site", "old", "low"]
+    assert ranked[0]["score"] > ranked[1]["score"]
+
+    top_news_only = rank_posts(POSTS, {"top_news": 1.0}, "us", top_k=1, now=NOW)
+    assert [post["title"] for post in top_news_only] == ["low"]
+
+def test_score_posts_without_metadata_keeps_order():
+    posts = [{"title": "a"}, {"title": "b"}]
+    assert [post["title"] for post in rank_posts(posts, {"performance_score": 1.0})] == ["a", "b"]
+    assert score_posts([], {"social": 1.0}).shape == (0,)
+    with pytest.raises(ValueError):
+        score_posts(posts, {"clicks": 1.0})
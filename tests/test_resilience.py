@@ -0,0 +1,93 @@
+import asyncio
+import time
+import httpx
+import openai
+import pytest
+from backend.resilience import LLMPolicy, acall_with_policy, aretry, is_retryable, retry_after
+
+
+def policy(**overrides):
+    return LLMPolicy(**{"deadline": 5.0, "max_attempts": 3, "backoff_base": 0.001, "backoff_max": 0.01, **overrides})
+
+def rate_limit_error(retry_after_seconds=None):
+    headers = {"retry-after": str(retry_after_seconds)} if retry_after_seconds is not None else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "https://openrouter.ai/api/v1/chat/completions"))
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+def flaky(*outcomes):
+    """Call returning or raising the given outcomes in turn, counting its attempts."""
+    outcomes = list(outcomes)
+    async def call(timeout):
+        call.attempts += 1
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        if isinstance(outcome, float):
+            await asyncio.sleep(outcome)
+            return "slow"
+        return outcome
+    call.attempts = 0
+    return call
+
+
+def test_is_retryable():
+    assert is_retryable(rate_limit_error())
+    assert is_retryable(asyncio.TimeoutError())
+    assert not is_retryable(asyncio.TimeoutError(), has_fallback=True)
+    assert is_retryable(rate_limit_error(), has_fallback=True)
+    assert not is_retryable(ValueError("bad request"))
+    assert retry_after(rate_limit_error(3)) == 3.0
+    assert retry_after(ValueError()) is None
+
+@pytest.mark.asyncio
+async def test_aretry_backs_off_on_rate_limits():
+    call = flaky(rate_limit_error(), rate_limit_error(0), "answer")
+    assert await aretry(call, policy(), time.monotonic() + 5) == "answer"
+    assert call.attempts == 3
+
+@pytest.mark.asyncio
+async def test_aretry_gives_up():
+    call = flaky(rate_limit_error(), rate_limit_error(), rate_limit_error())
+    with pytest.raises(openai.RateLimitError):
+        await aretry(call, policy(), time.monotonic() + 5)
+    assert call.attempts == 3
+    call = flaky(ValueError("bad request"), "answer")
+    with pytest.raises(ValueError):
+        await aretry(call, policy(), time.monotonic() + 5)
+    assert call.attempts == 1
+
+@pytest.mark.asyncio
+async def test_retry_after_beyond_deadline_fails_fast():
+    call = flaky(rate_limit_error(60), "answer")
+    with pytest.raises(openai.RateLimitError):
+        await acall_with_policy([call], policy(deadline=1.0))
+
+@pytest.mark.asyncio
+async def test_falls_back_to_next_model():
+    primary = flaky(ValueError("model not found"))
+    secondary = flaky("answer")
+    assert await acall_with_policy([primary, secondary], policy()) == "answer"
+
+@pytest.mark.asyncio
+async def test_unreachable_model_falls_back_without_retrying():
+    request = httpx.Request("POST", "http://ollama:11434/v1/chat/completions")
+    light = flaky(openai.APIConnectionError(request=request), "late answer")
+    heavy = flaky(openai.APIConnectionError(request=request), "answer")
+    assert await acall_with_policy([light, heavy], policy()) == "answer"
+    assert light.attempts == 1
+    # the last model has nothing to fall back to, so it is still retried
+    assert heavy.attempts == 2
+
+@pytest.mark.asyncio
+async def test_hedges_slow_model():
+    primary = flaky(5.0)
+    secondary = flaky("fast answer")
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    assert await acall_with_policy([primary, secondary], policy(hedge_after=0.05)) == "fast answer"
+    assert loop.time() - start < 1
+
+@pytest.mark.asyncio
+async def test_deadline():
+    with pytest.raises(TimeoutError):
+        await acall_with_policy([flaky(5.0)], policy(deadline=0.05))
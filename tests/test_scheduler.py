@@ -0,0 +1,76 @@
+import asyncio
+import json
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import Mock, AsyncMock
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from backend.graph import build_curation_agent
+from backend.scheduler import run_country, run_newsletter_agent_for_countries
+
+
+@pytest.mark.asyncio
+async def test_run_newsletter_agent_for_countries(mocker):
+    in_flight = 0
+    peak = 0
+    async def fake_ainvoke(state, config=None):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if state["country"] == "Japan":
+            raise RuntimeError("LLM unavailable")
+        return {"newsletter_title": f"{state['country']} news", "trending_news": [{"title": "a"}]}
+    graph = Mock()
+    graph.ainvoke = AsyncMock(side_effect=fake_ainvoke)
+    mocker.patch("backend.scheduler.build_curation_agent", return_value=graph)
+    mocker.patch("backend.scheduler.get_checkpointer", return_value=None)
+    mocker.patch("backend.scheduler.get_scraping_client", return_value=Mock(aclose=AsyncMock()))
+
+    results = await run_newsletter_agent_for_countries(["US", "Brazil", "Japan"], max_parallel=2)
+
+    assert [result.country for result in results] == ["US", "Brazil", "Japan"]
+    assert [result.ok for result in results] == [True, True, False]
+    assert results[1].newsletter_title == "Brazil news"
+    assert "LLM unavailable" in results[2].error
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_run_country_resumes_from_last_completed_node(mocker):
+    fetch = mocker.patch("backend.graph.afetch_news_api", AsyncMock(return_value={"trending_news": [{"title": "News", "content": "Something happened."}]}))
+    async def fake_ainvoke(messages, **kwargs):
+        human = messages[-1].content
+        if "email" in human:
+            return AIMessage(content=json.dumps({"Subject": "Hi", "HTML": "<p>Hi</p>"}))
+        return AIMessage(content=json.dumps({"Title": "Big day", "Content": "Story"}))
+    chat_model = Mock()
+    chat_model.ainvoke = AsyncMock(side_effect=fake_ainvoke)
+    mocker.patch("backend.graph.get_route_models", return_value=[chat_model])
+    session = AsyncMock()
+    session.add = Mock()
+    @asynccontextmanager
+    async def fake_session():
+        yield session
+    mocker.patch("backend.graph.get_pg_async_session", fake_session)
+    send_campaign = mocker.patch("backend.graph.send_campaign", AsyncMock(side_effect=[OSError("SMTP down"), None]))
+    graph = build_curation_agent(InMemorySaver())
+    semaphore = asyncio.Semaphore(1)
+
+    failed = await run_country(graph, "US", semaphore)
+    assert not failed.ok
+    llm_calls = chat_model.ainvoke.await_count
+
+    resumed = await run_country(graph, "US", semaphore, resume=True)
+    assert resumed.ok
+    assert resumed.newsletter_title == "Big day"
+    # scraping and generation are not repeated, only the failed node runs again
+    fetch.assert_awaited_once()
+    assert chat_model.ainvoke.await_count == llm_calls
+    assert send_campaign.await_count == 2
+
+    # a finished run is not sent twice
+    again = await run_country(graph, "US", semaphore, resume=True)
+    assert again.ok
+    assert send_campaign.await_count == 2
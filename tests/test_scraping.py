@@ -0,0 +1,59 @@
+import asyncio
+import time
+import httpx
+import pytest
+from backend.scraping import TokenBucket, ScrapingClient, normalize_url, canonical_url
+
+
+def test_normalize_url():
+    assert normalize_url("HTTPS://WWW.Example.com:443/news?utm_source=x&b=2&a=1#top") == "https://www.example.com/news?a=1&b=2"
+    assert normalize_url("http://example.com") == "http://example.com/"
+    assert normalize_url("http://example.com:8080/a?fbclid=1") == "http://example.com:8080/a"
+
+def test_canonical_url():
+    canonical = canonical_url("https://www.example.com/news/story-1/")
+    assert canonical_url("http://example.com/news/story-1?utm_medium=social") == canonical
+    assert canonical_url("https://amp.example.com/news/story-1/amp/") == canonical
+    assert canonical_url("https://example.com/news/story-1?outputType=amp") == canonical
+    assert canonical_url("https://example.com/news/story-2") != canonical
+
+def test_token_bucket_reserve():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    wait = bucket.reserve()
+    assert 0.05 < wait <= 0.1
+
+def test_sessions_are_reused_per_host(mocker):
+    client = ScrapingClient(rate_per_domain=100, burst_per_domain=10, max_in_flight=2, pool_size_per_host=2, timeout=1)
+    mock_get = mocker.patch("backend.scraping.requests.Session.get")
+
+    client.get("https://a.com/1")
+    client.get("https://A.com/2")
+    client.get("https://b.com/1")
+
+    assert set(client._sessions) == {"a.com", "b.com"}
+    assert mock_get.call_count == 3
+
+@pytest.mark.asyncio
+async def test_aget_limits_in_flight_and_domain_rate():
+    in_flight = 0
+    peak = 0
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, text="ok")
+    client = ScrapingClient(rate_per_domain=50, burst_per_domain=2, max_in_flight=3, pool_size_per_host=3, timeout=1, transport=httpx.MockTransport(handler))
+
+    start = time.monotonic()
+    responses = await asyncio.gather(*(client.aget(f"https://same.com/{i}") for i in range(6)))
+    elapsed = time.monotonic() - start
+    await client.aclose()
+
+    assert all(response.status_code == 200 for response in responses)
+    assert peak <= 3
+    # 2 burst tokens, then 4 more at 50/s
+    assert elapsed >= 0.07
@@ -0,0 +1,79 @@
+import json
+import pytest
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import StateGraph, START, END
+from backend.state import AgentState
+from backend.streaming import LLMOutputAborted, StreamProgress, astream_run_events, format_sse
+from backend.structured import ainvoke_structured, NewsletterOutput
+
+
+def graph_writing(answer: str, **compile_options):
+    chat_model = GenericFakeChatModel(messages=iter([AIMessage(content=answer)]))
+    async def write(state: AgentState) -> dict:
+        output, raw_content = await ainvoke_structured(chat_model, [HumanMessage(content="write")], NewsletterOutput, stream_node="write")
+        return {"newsletter_title": output.Title if output else None, "newsletter_content": raw_content}
+    builder = StateGraph(AgentState)
+    builder.add_node("write", write)
+    builder.add_edge(START, "write")
+    builder.add_edge("write", END)
+    return builder.compile(**compile_options)
+
+@pytest.mark.asyncio
+async def test_stream_reports_progress(mocker):
+    mocker.patch("backend.structured.settings.LLM_STREAM_PROGRESS_EVERY", 5)
+    answer = json.dumps({"Title": "Big day", "Content": " ".join(["word"] * 30)})
+
+    events = [event async for event in astream_run_events(graph_writing(answer), {}, {})]
+
+    names = [name for name, _ in events]
+    assert names[0] == "first_token"
+    assert "progress" in names
+    assert ("field", {"event": "field", "node": "write", "field": "Title", "value": "Big day"}) in events
+    assert names[-3:] == ["completed", "node_completed", "done"]
+
+@pytest.mark.asyncio
+async def test_stream_aborts_output_without_json(mocker):
+    mocker.patch("backend.structured.settings.LLM_STREAM_ABORT_CHARS", 40)
+    answer = "<think>" + "thinking " * 20 + "</think>" + "I am sorry, I cannot write this newsletter today " * 10
+
+    events = [event async for event in astream_run_events(graph_writing(answer), {}, {})]
+
+    aborted = [data for name, data in events if name == "aborted"]
+    assert len(aborted) == 1
+    # the reasoning is not counted, the refusal is cut short
+    assert aborted[0]["tokens"] < len(answer.split())
+    assert events[-1][0] == "done"
+
+@pytest.mark.asyncio
+async def test_stream_progress_handles_split_tokens():
+    events = []
+    progress = StreamProgress("write", ["Title", "Content"], abort_after_chars=30, progress_every=1000)
+    progress.writer = events.append
+    # tags, keys and escapes cut across tokens, and a "{" while thinking that is not the JSON
+    tokens = ["<thi", "nk>maybe {", '"Title": "dr', 'aft"}</th', "ink>\n", '{"Content": "a \\"quo', 'ted\\" word", "Ti', 'tle"  :  "Big \\\\', ' day"}']
+    for token in tokens:
+        await progress.on_llm_new_token(token)
+    assert [(event["field"], event["value"]) for event in events if event["event"] == "field"] == [
+        ("Content", 'a \\"quoted\\" word'),
+        ("Title", "Big \\\\ day"),
+    ]
+
+    refusal = StreamProgress("write", ["Title"], abort_after_chars=30, progress_every=1000)
+    refusal.writer = events.append
+    await refusal.on_llm_new_token("<think>" + "long reasoning " * 10 + "</thi")
+    with pytest.raises(LLMOutputAborted):
+        for token in ["nk>", "I am sorry, ", "I cannot write ", "this newsletter"]:
+            await refusal.on_llm_new_token(token)
+
+@pytest.mark.asyncio
+async def test_stream_reports_interrupt():
+    graph = graph_writing("{}", checkpointer=InMemorySaver(), interrupt_before=["write"])
+
+    events = [event async for event in astream_run_events(graph, {}, {"configurable": {"thread_id": "preview"}})]
+
+    assert [name for name, _ in events] == ["interrupted", "done"]
+
+def test_format_sse():
+    assert format_sse("done", {"seconds": 1.5}) == 'event: done\ndata: {"seconds": 1.5}\n\n'
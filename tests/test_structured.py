@@ -0,0 +1,74 @@
+import pytest
+from unittest.mock import Mock, AsyncMock
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from backend.cache import MemoryCache
+from backend.llm import TieredLLMCache
+from backend.structured import repair_json, parse_structured, ainvoke_structured, ainvoke_structured_with_fallbacks, NewsletterOutput, EmailOutput
+
+
+@pytest.mark.parametrize("text", [
+    '{"Title": "Big day", "Content": "Story"}',
+    '<think>Let me write JSON.</think>\n```json\n{"Title": "Big day", "Content": "Story",\n}\n```',
+    'Sure! Here it is: {"Title": "Big day", "Content": "Story"} Hope you like it.',
+])
+def test_parse_structured_newsletter(text):
+    assert parse_structured(text, NewsletterOutput) == NewsletterOutput(Title="Big day", Content="Story")
+
+def test_repair_json_escapes_raw_newlines():
+    assert repair_json('{"Title": "Big day", "Content": "Line one\nLine two",}') == {"Title": "Big day", "Content": "Line one\nLine two"}
+
+def test_parse_structured_unescaped_html_quotes():
+    text = '{\n  "Subject": "Don\'t miss "today" 🔥",\n  "HTML": "<td align="center" style="color: #333;">Hi</td>\n",\n}'
+    output = parse_structured(text, EmailOutput)
+    assert output.Subject == 'Don\'t miss "today" 🔥'
+    assert output.HTML == '<td align="center" style="color: #333;">Hi</td>\n'
+
+def test_parse_structured_gives_up():
+    assert parse_structured("I can't help with that.", NewsletterOutput) is None
+    assert parse_structured('{"Title": "only a title"}', NewsletterOutput) is None
+
+@pytest.mark.asyncio
+async def test_ainvoke_structured_repairs_provider_output(mocker):
+    mocker.patch("backend.structured.settings.LLM_STRUCTURED_OUTPUT", "json_mode")
+    raw = AIMessage(content='{"Title": "Big day", "Content": "Story",}')
+    structured_model = Mock()
+    structured_model.ainvoke = AsyncMock(return_value={"raw": raw, "parsed": None, "parsing_error": ValueError()})
+    chat_model = Mock()
+    chat_model.with_structured_output.return_value = structured_model
+
+    output, raw_content = await ainvoke_structured(chat_model, [HumanMessage(content="write")], NewsletterOutput)
+
+    chat_model.with_structured_output.assert_called_once_with(NewsletterOutput, method="json_mode", include_raw=True)
+    assert output == NewsletterOutput(Title="Big day", Content="Story")
+    assert raw_content == raw.content
+
+
+@pytest.mark.asyncio
+async def test_ainvoke_structured_falls_back_on_unparseable_answer():
+    light = Mock(ainvoke=AsyncMock(return_value=AIMessage(content="Here is your newsletter, enjoy!")))
+    heavy = Mock(ainvoke=AsyncMock(return_value=AIMessage(content='{"Title": "Big day", "Content": "Story"}')))
+
+    output, raw_content = await ainvoke_structured_with_fallbacks([light, heavy], [HumanMessage(content="write")], NewsletterOutput)
+
+    assert output == NewsletterOutput(Title="Big day", Content="Story")
+    light.ainvoke.assert_awaited_once()
+
+    output, raw_content = await ainvoke_structured_with_fallbacks([light], [HumanMessage(content="write")], NewsletterOutput)
+    assert output is None
+    assert raw_content == "Here is your newsletter, enjoy!"
+
+@pytest.mark.asyncio
+async def test_unparseable_answer_is_evicted_from_cache(mocker):
+    cache = TieredLLMCache(MemoryCache(16, ttl=60))
+    mocker.patch("backend.llm._llm_cache", cache)
+    mocker.patch("backend.structured.settings.LLM_STRUCTURED_OUTPUT", "none")
+    answers = iter([AIMessage("Here is your newsletter, enjoy!"), AIMessage('{"Title": "Big day", "Content": "Story"}')])
+    model = GenericFakeChatModel(messages=answers, cache=cache)
+
+    output, _ = await ainvoke_structured_with_fallbacks([model], [HumanMessage(content="write")], NewsletterOutput)
+    assert output is None
+    assert not cache.memory.entries
+    output, _ = await ainvoke_structured_with_fallbacks([model], [HumanMessage(content="write")], NewsletterOutput)
+    assert output == NewsletterOutput(Title="Big day", Content="Story")
+    assert len(cache.memory.entries) == 1
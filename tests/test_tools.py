@@ -1,7 +1,13 @@
 import pytest 
 from  unittest.mock import patch, Mock, AsyncMock, MagicMock
 import stripe
-from backend.tools import fetch_news_api, create_stripe_customer, update_user_subscription, send_email
+import asyncio
+import httpx
+import requests
+import backend.tools
+from backend.cache import DiskCache
+from backend.scraping import ScrapingClient
+from backend.tools import fetch_news_api, afetch_news_api, fetch_articles, unique_posts, aget_text_content, create_stripe_customer, update_user_subscription, send_email
 from datetime import datetime
 from backend.db import get_pg_async_session
 from backend.models.user import User
@@ -1094,23 +1100,117 @@ def test_fetch_news_api_success(mocker):
         "requestsLeft": 926,
         "warnings": None
     }
-    mocker.patch("backend.tools.requests.get", return_value=mock_response)
+    mock_client = Mock(get=Mock(return_value=mock_response))
+    mocker.patch("backend.tools.get_scraping_client", return_value=mock_client)
     mocker.patch("backend.tools.get_text_content", return_value="Here is the dummy test content.")
     result = fetch_news_api("US")
     
+    mock_client.get.assert_called_once()
+    
     assert result["trending_news"][0]["title"] == "Sneak peek: Unmasking the Zombie Hunter - CBS News"
     assert result["trending_news"][1]["title"] == "Dana White says UFC's White House fight card on July 4 will 'absolutely' take place"
     assert result["trending_news"][2]["title"] == "Social media opens a window to traditional trades for young workers"
 
-@patch("backend.tools.requests.get")
-def test_fetch_news_api_failure(mock_get):
+@patch("backend.tools.get_scraping_client")
+def test_fetch_news_api_failure(mock_get_client):
     mock_response = Mock()
     mock_response.status_code = 404
-    mock_get.return_value = mock_response
+    mock_get_client.return_value.get.return_value = mock_response
     result = fetch_news_api("US")
     
     assert result == {"trending_news": "Error fetching news: 404"}
 
+    mock_get_client.return_value.get.side_effect = requests.ConnectionError("refused")
+    assert fetch_news_api("US") == {"trending_news": "Error fetching news: refused"}
+
+
+@pytest.mark.asyncio
+async def test_afetch_news_api_keeps_order(mocker):
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {
+        "posts": [
+            {"url": "https://a.com/1", "title": "slow"},
+            {"url": "https://b.com/2", "title": "empty"},
+            {"url": "https://c.com/3", "title": "fast"},
+        ]
+    }
+    mock_client = Mock()
+    mock_client.aget = AsyncMock(return_value=mock_response)
+    mocker.patch("backend.tools.get_scraping_client", return_value=mock_client)
+
+    delays = {"https://a.com/1": 0.05, "https://b.com/2": 0, "https://c.com/3": 0}
+    async def fake_content(url):
+        await asyncio.sleep(delays[url])
+        return "" if url == "https://b.com/2" else f"content of {url}"
+    mocker.patch("backend.tools.aget_text_content", side_effect=fake_content)
+
+    result = await afetch_news_api("US")
+
+    assert [news["title"] for news in result["trending_news"]] == ["slow", "fast"]
+    assert result["trending_news"][0]["content"] == "content of https://a.com/1"
+
+@pytest.mark.asyncio
+async def test_fetch_articles_stops_at_target(mocker):
+    posts = [{"url": f"https://news.com/{i}"} for i in range(10)]
+    fetched = []
+    async def fake_content(url):
+        fetched.append(url)
+        await asyncio.sleep(0.01)
+        return {"https://news.com/0": "", "https://news.com/2": "same"}.get(url, "same" if url == "https://news.com/3" else url)
+    mocker.patch("backend.tools.aget_text_content", side_effect=fake_content)
+
+    contents = await fetch_articles(posts, target=3)
+
+    assert contents[:5] == ["", "https://news.com/1", "same", "", "https://news.com/4"]
+    assert contents[5:] == [""] * 5
+    assert len(fetched) < 10
+
+def test_unique_posts():
+    posts = [
+        {"url": "https://www.news.com/story?utm_source=x", "title": "a"},
+        {"url": "https://amp.news.com/story/amp", "title": "b"},
+        {"url": "https://news.com/other", "title": "c"},
+    ]
+    assert [post["title"] for post in unique_posts(posts)] == ["a", "c"]
+
+@pytest.mark.asyncio
+async def test_aget_text_content(mocker):
+    def handler(request):
+        if request.url.host == "timeout.com":
+            raise httpx.ReadTimeout("timed out", request=request)
+        return httpx.Response(200, text="<html><nav>menu</nav><article><p>Hello</p> <p>world</p></article></html>")
+    client = ScrapingClient(rate_per_domain=100, burst_per_domain=10, max_in_flight=2, pool_size_per_host=2, timeout=1, transport=httpx.MockTransport(handler))
+    mocker.patch("backend.tools.get_scraping_client", return_value=client)
+    mocker.patch("backend.tools.get_article_cache", return_value=None)
+
+    assert await aget_text_content("https://news.com/a") == "Hello world"
+    assert await aget_text_content("https://timeout.com/a") == ""
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_aget_text_content_revalidates_cached_article(mocker, tmp_path):
+    requests_seen = []
+    def handler(request):
+        requests_seen.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text="<article>Cached story</article>", headers={"ETag": '"v1"'})
+    client = ScrapingClient(rate_per_domain=100, burst_per_domain=10, max_in_flight=2, pool_size_per_host=2, timeout=1, transport=httpx.MockTransport(handler))
+    mocker.patch("backend.tools.get_scraping_client", return_value=client)
+    mocker.patch("backend.tools.get_article_cache", return_value=DiskCache(tmp_path / "articles.sqlite3", ttl=3600, max_bytes=10_000))
+    extract = mocker.spy(backend.tools, "extract_text")
+
+    mocker.patch("backend.tools.settings.ARTICLE_CACHE_REVALIDATE_AFTER", 3600)
+    assert await aget_text_content("https://news.com/a?utm_source=x") == "Cached story"
+    assert await aget_text_content("https://news.com/a") == "Cached story"
+    assert len(requests_seen) == 1
+
+    mocker.patch("backend.tools.settings.ARTICLE_CACHE_REVALIDATE_AFTER", 0)
+    assert await aget_text_content("https://news.com/a") == "Cached story"
+    assert len(requests_seen) == 2
+    assert extract.call_count == 1
+    await client.aclose()
 
 @patch("backend.tools.stripe.Customer.create")
 def test_create_stripe_customer(mock_create):